@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import order_history, signup_view, login_view, logout_view
+from .views import order_history, order_detail, signup_view, login_view, logout_view
 
 urlpatterns = [
     path('orders/', order_history, name='order_history'),
+    path('orders/<int:order_id>/', order_detail, name='order_detail'),
     path('signup/', signup_view, name='signup'),
     path('login/', login_view, name='login'),
     path('logout/', logout_view, name='logout'),
@@ -1,16 +1,30 @@
-from django.shortcuts import render, redirect
+from django.conf import settings
+from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib import messages
 from shop.models import Order
+from shop.pagination import paginate_keyset
 
 # Create your views here.
 
 @login_required
 def order_history(request):
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'accounts/order_history.html', {'orders': orders})
+    orders = Order.objects.filter(user=request.user)
+    page = paginate_keyset(orders, request.GET.get('before'), settings.ORDER_HISTORY_PER_PAGE, ordering='-created_at')
+    return render(request, 'accounts/order_history.html', {
+        'orders': page.items,
+        'next_cursor': page.next_cursor
+    })
+
+@login_required
+def order_detail(request, order_id):
+    order = get_object_or_404(Order, id=order_id, user=request.user)
+    return render(request, 'accounts/order_detail.html', {
+        'order': order,
+        'items': order.items.all()
+    })
 
 def signup_view(request):
     if request.method == 'POST':
@@ -0,0 +1,158 @@
+"""Query-count and latency budgets for named views.
+
+``budgets.json`` lists the data sizes to test at and, per view, the request
+to make and its budget::
+
+    "cart_view": {"max_queries": 6, "max_ms": 150}
+    "add_to_cart": {"method": "post", "args": ["product"], "max_queries": 8, "max_ms": 150}
+
+Keys are URL names, optionally followed by a space and a label when the
+same URL is measured more than once; ``url`` overrides the name. ``args``
+may use ``"product"`` for a product in the user's cart; ``params`` is the
+query string, or the form data of a POST. Requests are made as the
+logged-in budget user unless ``"anonymous": true``. Every run starts with
+empty caches and the user's cart as ``grow`` left it, so cached views are
+measured on the path that queries and a checkout POST always has a cart
+to order.
+"""
+import json
+import random
+import statistics
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from shop import catalog
+from shop.models import Cart, CartLine, Order, Product, Wishlist
+from shop.wishlists import WishlistItem
+
+from . import generator
+
+BUDGET_FILE = Path(__file__).with_name('budgets.json')
+
+
+@dataclass
+class Measurement:
+    queries: int
+    ms: float
+    status: int
+
+
+def load_budgets(path=BUDGET_FILE):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def grow(user, size, seed=0):
+    """Top the database up to ``size``: products, and the user's orders, cart and wishlist."""
+    rng = random.Random(seed)
+    missing = size['products'] - Product.objects.count()
+    if missing > 0:
+        generator.create_products(rng, missing, 1000)
+    products = list(Product.objects.order_by('id'))
+
+    cart, _ = Cart.objects.get_or_create(user=user)
+    in_cart = set(cart.lines.values_list('product_id', flat=True))
+    CartLine.objects.bulk_create([
+        CartLine(cart=cart, product=product, quantity=rng.randint(1, 3))
+        for product in rng.sample([p for p in products if p.id not in in_cart],
+                                  max(0, size['cart_lines'] - len(in_cart)))
+    ])
+
+    wishlist, _ = Wishlist.objects.get_or_create(user=user)
+    wished = set(WishlistItem.objects.filter(wishlist=wishlist).values_list('product_id', flat=True))
+    WishlistItem.objects.bulk_create([
+        WishlistItem(wishlist=wishlist, product=product)
+        for product in rng.sample([p for p in products if p.id not in wished],
+                                  max(0, size['wishlist'] - len(wished)))
+    ])
+
+    missing = size['orders'] - Order.objects.filter(user=user).count()
+    if missing > 0:
+        generator.create_orders(rng, [user], products, missing, 1000, guest_ratio=0)
+    catalog.invalidate()
+
+
+def clear_caches():
+    catalog.local_cache.clear()
+    for alias in {settings.CATALOG_CACHE_ALIAS, settings.PAGE_CACHE_ALIAS}:
+        caches[alias].clear()
+
+
+def request_for(key, spec, user):
+    url = spec.get('url', key.split()[0])
+    args = []
+    for arg in spec.get('args', []):
+        if arg == 'product':
+            arg = CartLine.objects.filter(cart__user=user).order_by('id').values_list('product_id', flat=True)[0]
+        args.append(arg)
+    return spec.get('method', 'get'), reverse(url, args=args), spec.get('params')
+
+
+def cart_restorer(user):
+    """A function that puts the user's cart lines back as they are now."""
+    cart, _ = Cart.objects.get_or_create(user=user)
+    lines = list(cart.lines.values_list('product_id', 'quantity'))
+
+    def restore():
+        cart.lines.all().delete()
+        CartLine.objects.bulk_create([
+            CartLine(cart=cart, product_id=product_id, quantity=quantity) for product_id, quantity in lines
+        ])
+
+    return restore
+
+
+def measure(client, method, path, data=None, repeat=3, setup=None):
+    """Query count of a cold request and the median time of ``repeat`` cold requests."""
+    queries, timings, status = None, [], None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        clear_caches()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = getattr(client, method)(path, data)
+            timings.append((time.perf_counter() - started) * 1000)
+        if queries is None:
+            queries, status = len(captured), response.status_code
+    return Measurement(queries=queries, ms=statistics.median(timings), status=status)
+
+
+def measure_views(client, user, budgets, repeat=3):
+    """Return ``{key: Measurement}`` for every view in ``budgets``."""
+    results = {}
+    restore_cart = cart_restorer(user)
+    for key, spec in budgets['views'].items():
+        if spec.get('anonymous'):
+            client.logout()
+        else:
+            client.force_login(user)
+        method, path, params = request_for(key, spec, user)
+        results[key] = measure(client, method, path, params, repeat, setup=restore_cart)
+    return results
+
+
+def check(budgets, results_by_size):
+    """List every budget violation across the measured sizes."""
+    failures = []
+    for key, spec in budgets['views'].items():
+        counts = {}
+        for size, results in results_by_size.items():
+            result = results[key]
+            counts[size] = result.queries
+            if result.status >= 400:
+                failures.append(f'{key} [{size}]: HTTP {result.status}')
+            if result.queries > spec['max_queries']:
+                failures.append(f"{key} [{size}]: {result.queries} queries > budget {spec['max_queries']}")
+            if result.ms > spec['max_ms']:
+                failures.append(f"{key} [{size}]: {result.ms:.1f} ms > budget {spec['max_ms']} ms")
+        if len(set(counts.values())) > 1:
+            failures.append(f'{key}: query count grows with data size {counts}')
+    return failures
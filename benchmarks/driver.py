@@ -0,0 +1,163 @@
+"""Scripted shopper journeys replayed against a running server.
+
+Every virtual user runs in its own thread with its own cookie jar and picks
+journeys at random from the configured mix until the run ends. Each HTTP
+request is recorded under the name of its step; redirects are not followed,
+so a step measures exactly one request.
+"""
+import json
+import random
+import threading
+import time
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, build_opener
+
+from django.urls import reverse
+
+from .generator import PASSWORD, SEARCH_TERMS
+
+
+class NoRedirect(HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def add(self, step, latency, ok):
+        with self._lock:
+            if ok:
+                self.samples.setdefault(step, []).append(latency)
+            else:
+                self.errors[step] = self.errors.get(step, 0) + 1
+
+
+class Shopper:
+    """One browser: a cookie jar plus the CSRF token for its session."""
+
+    def __init__(self, base_url, recorder, rng):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.rng = rng
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()), NoRedirect)
+        self.csrf_token = ''
+
+    def request(self, step, path, data=None):
+        body = None
+        if data is not None:
+            body = urlencode({**data, 'csrfmiddlewaretoken': self.csrf_token}).encode()
+        started = time.perf_counter()
+        try:
+            with self.opener.open(self.base_url + path, body, timeout=30) as response:
+                status, content = response.status, response.read()
+        except HTTPError as exc:
+            status, content = exc.code, exc.read()
+        except (URLError, OSError):
+            status, content = 0, b''
+        self.recorder.add(step, time.perf_counter() - started, 200 <= status < 400)
+        return content
+
+    def get(self, step, path, **params):
+        return self.request(step, path + ('?' + urlencode(params) if params else ''))
+
+    def post(self, step, path, data=None):
+        return self.request(step, path, data or {})
+
+    def refresh_session(self):
+        # Catalog pages may come from the anonymous page cache with a
+        # placeholder token; the session fragment always has the real one.
+        content = self.get('session_fragment', reverse('session_fragment'))
+        try:
+            self.csrf_token = json.loads(content)['csrf_token']
+        except (ValueError, KeyError):
+            self.csrf_token = ''
+
+
+def browse(shopper, product_ids):
+    shopper.get('product_list', reverse('product_list'))
+    shopper.refresh_session()
+    shopper.get('search', reverse('product_list'), q=shopper.rng.choice(SEARCH_TERMS))
+    picked = shopper.rng.sample(product_ids, min(len(product_ids), shopper.rng.randint(1, 3)))
+    for product_id in picked:
+        shopper.get('product_detail', reverse('product_detail', args=[product_id]))
+    return picked
+
+
+def buy(shopper, picked):
+    for product_id in picked:
+        shopper.post('add_to_cart', reverse('add_to_cart', args=[product_id]))
+    shopper.get('cart_view', reverse('cart_view'))
+    shopper.get('checkout', reverse('checkout'))
+    shopper.post('checkout_submit', reverse('checkout'), {
+        'name': 'Load Test', 'email': 'load@example.com', 'address': '1 Benchmark Way',
+    })
+
+
+def guest_journey(shopper, product_ids, usernames):
+    """Browse, search, look at a few products, buy them as a guest."""
+    buy(shopper, browse(shopper, product_ids))
+
+
+def customer_journey(shopper, product_ids, usernames):
+    """Log in, browse, wishlist and buy, then look at the order history."""
+    shopper.refresh_session()
+    shopper.post('login', reverse('login'), {'username': shopper.rng.choice(usernames), 'password': PASSWORD})
+    shopper.refresh_session()
+    picked = browse(shopper, product_ids)
+    shopper.post('add_to_wishlist', reverse('add_to_wishlist', args=[picked[0]]))
+    shopper.get('wishlist_view', reverse('wishlist_view'))
+    buy(shopper, picked)
+    shopper.get('order_history', reverse('order_history'))
+    shopper.get('logout', reverse('logout'))
+
+
+def scraper_journey(shopper, product_ids, usernames):
+    """Walk the first pages of the catalog API, as a partner feed would."""
+    path = reverse('api_products')
+    for _ in range(5):
+        try:
+            path = json.loads(shopper.get('api_products', path))['next']
+        except (ValueError, KeyError):
+            return
+        if not path:
+            return
+
+
+JOURNEYS = {
+    'guest': guest_journey,
+    'customer': customer_journey,
+    'scraper': scraper_journey,
+}
+
+
+def run(base_url, product_ids, usernames, concurrency=8, duration=30.0, mix=None, seed=0):
+    """Replay journeys for ``duration`` seconds; returns the recorder and journey counts."""
+    mix = mix or {'guest': 3, 'customer': 1}
+    if not usernames:
+        mix.pop('customer', None)
+    names, weights = zip(*mix.items())
+    recorder = Recorder()
+    journeys = {name: 0 for name in names}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def user(index):
+        rng = random.Random(seed * 1000 + index)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            JOURNEYS[name](Shopper(base_url, recorder, rng), product_ids, usernames)
+            with lock:
+                journeys[name] += 1
+
+    threads = [threading.Thread(target=user, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, journeys
@@ -0,0 +1,137 @@
+"""Seeded synthetic catalog, customers, wishlists and orders for load tests.
+
+The same seed always produces the same data, so runs on different commits
+are measured against identical databases. Rows are written with
+``bulk_create`` in batches; users share one precomputed password hash.
+"""
+import io
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image
+
+from shop import facets, recommendations, search
+from shop.models import Order, OrderItem, Product, Wishlist
+from shop.storage import product_image_storage
+from shop.wishlists import WishlistItem
+
+ADJECTIVES = ['wireless', 'portable', 'smart', 'compact', 'stainless', 'ergonomic', 'premium',
+              'rugged', 'ultra', 'classic', 'mini', 'pro', 'digital', 'waterproof', 'leather']
+NOUNS = ['headphones', 'speaker', 'bottle', 'keyboard', 'mouse', 'charger', 'watch', 'camera',
+         'backpack', 'monitor', 'lamp', 'router', 'wallet', 'sneakers', 'tablet', 'drone']
+FEATURES = ['bluetooth', 'noise cancelling', 'fast charging', 'usb-c', 'long battery life',
+            'lightweight', 'scratch resistant', 'hd display', 'dual band', 'cold for 24 hours']
+SEARCH_TERMS = NOUNS + [f'{adjective} {noun}' for adjective in ADJECTIVES[:4] for noun in NOUNS[:4]]
+
+USERNAME_PREFIX = 'bench-user-'
+PASSWORD = 'bench-password-1'
+SWATCHES = 16
+
+User = get_user_model()
+
+
+def swatch_images(rng):
+    """Store a handful of solid-colour JPEGs shared by all generated products."""
+    names = []
+    for _ in range(SWATCHES):
+        buffer = io.BytesIO()
+        colour = tuple(rng.randrange(256) for _ in range(3))
+        Image.new('RGB', (800, 800), colour).save(buffer, 'JPEG', quality=80)
+        names.append(product_image_storage.save('products/swatch.jpg', ContentFile(buffer.getvalue())))
+    return names
+
+
+def create_products(rng, count, batch_size):
+    images = swatch_images(rng)
+    created = []
+    for start in range(0, count, batch_size):
+        batch = [
+            Product(
+                name=f'{rng.choice(ADJECTIVES)} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {start + i}'.capitalize(),
+                price=Decimal(rng.randint(199, 99999)) / 100,
+                description=', '.join(rng.sample(FEATURES, 3)).capitalize() + '.',
+                image=rng.choice(images),
+            )
+            for i in range(min(batch_size, count - start))
+        ]
+        with transaction.atomic():
+            batch = Product.objects.bulk_create(batch)
+            search.index_products(batch)
+        created.extend(batch)
+    return created
+
+
+def create_users(rng, count, batch_size):
+    password = make_password(PASSWORD)
+    users = [
+        User(username=f'{USERNAME_PREFIX}{i}', email=f'{USERNAME_PREFIX}{i}@example.com', password=password)
+        for i in range(count)
+    ]
+    User.objects.bulk_create(users, batch_size=batch_size, ignore_conflicts=True)
+    return list(User.objects.filter(username__startswith=USERNAME_PREFIX).order_by('id'))
+
+
+def create_wishlists(rng, users, products, size, batch_size):
+    Wishlist.objects.bulk_create([Wishlist(user=user) for user in users], ignore_conflicts=True)
+    wishlists = Wishlist.objects.filter(user__in=[user.id for user in users]).only('id')
+    items = [
+        WishlistItem(wishlist_id=wishlist.id, product_id=product.id)
+        for wishlist in wishlists
+        for product in rng.sample(products, min(size, len(products)))
+    ]
+    WishlistItem.objects.bulk_create(items, batch_size=batch_size, ignore_conflicts=True)
+    return len(items)
+
+
+def create_orders(rng, users, products, count, batch_size, guest_ratio=0.2):
+    for start in range(0, count, batch_size):
+        orders, order_items = [], []
+        for _ in range(min(batch_size, count - start)):
+            user = rng.choice(users) if users and rng.random() >= guest_ratio else None
+            items = [
+                OrderItem(product=product, product_name=product.name, unit_price=product.price,
+                          quantity=rng.randint(1, 3))
+                for product in rng.sample(products, rng.randint(1, min(4, len(products))))
+            ]
+            order = Order(
+                user=user,
+                name=user.username if user else 'Guest Shopper',
+                email=user.email if user else 'guest@example.com',
+                address='1 Benchmark Way',
+                total_price=sum(item.unit_price * item.quantity for item in items),
+            )
+            order.summarize(items)
+            orders.append(order)
+            order_items.append(items)
+        with transaction.atomic():
+            Order.objects.bulk_create(orders)
+            for order, items in zip(orders, order_items):
+                for item in items:
+                    item.order = order
+            OrderItem.objects.bulk_create([item for items in order_items for item in items])
+
+
+def generate(products=1000, users=100, orders=1000, wishlist_size=5, seed=0, batch_size=1000):
+    """Create the requested rows and return how many of each were written."""
+    rng = random.Random(seed)
+    created = create_products(rng, products, batch_size)
+    if not created:
+        created = list(Product.objects.all())
+    accounts = create_users(rng, users, batch_size)[:users]
+    wishlist_items = create_wishlists(rng, accounts, created, wishlist_size, batch_size) if created else 0
+    if created:
+        create_orders(rng, accounts, created, orders, batch_size)
+    # Rows went in with bulk_create, which skips the signals behind these.
+    facets.rebuild_buckets()
+    facets.rebuild_popularity()
+    recommendations.rebuild()
+    return {
+        'products': len(created),
+        'users': len(accounts),
+        'wishlist_items': wishlist_items,
+        'orders': orders if created else 0,
+    }
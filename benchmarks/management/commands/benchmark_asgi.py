@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand
+
+from benchmarks.servers import HOST, start_server
+from benchmarks.stats import summarize
+
+
+async def fetch(port, path, drip):
+    """GET ``path``; a non-zero ``drip`` sends the request in pieces over that many seconds."""
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(HOST, port)
+    payload = (f'GET {path} HTTP/1.1\r\nHost: localhost\r\nUser-Agent: benchmark_asgi\r\n'
+               f'Accept: */*\r\nConnection: close\r\n\r\n').encode()
+    if drip:
+        step = -(-len(payload) // 8)
+        for offset in range(0, len(payload), step):
+            writer.write(payload[offset:offset + step])
+            await writer.drain()
+            await asyncio.sleep(drip / 8)
+    else:
+        writer.write(payload)
+    response = await reader.read()
+    writer.close()
+    status = int(response.split(b' ', 2)[1]) if response else 0
+    return status, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = ('Serve the project over WSGI (fixed thread pool) and ASGI (event loop) in turn, '
+            'hit both with a mix of slow clients that trickle their requests and fast '
+            'clients, and compare throughput and latency.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/catalog/products/')
+        parser.add_argument('--slow-clients', type=int, default=200)
+        parser.add_argument('--fast-clients', type=int, default=10)
+        parser.add_argument('--drip', type=float, default=1.0,
+                            help='Seconds a slow client takes to send its request.')
+        parser.add_argument('--workers', type=int, default=16, help='WSGI worker threads.')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per server.')
+
+    def handle(self, *args, **options):
+        for kind, name in [('wsgi', f"WSGI ({options['workers']} threads)"), ('asgi', 'ASGI')]:
+            port, stop = start_server(kind, options['workers'])
+            try:
+                self.report(name, asyncio.run(self.load(port, options)), options)
+            finally:
+                stop()
+
+    async def load(self, port, options):
+        deadline = time.perf_counter() + options['duration']
+        results = {'slow': ([], []), 'fast': ([], [])}
+
+        async def client(kind, drip):
+            latencies, errors = results[kind]
+            while time.perf_counter() < deadline:
+                try:
+                    status, latency = await fetch(port, options['path'], drip)
+                except OSError as exc:
+                    errors.append(exc)
+                    continue
+                if status == 200:
+                    latencies.append(latency)
+                else:
+                    errors.append(status)
+
+        await asyncio.gather(
+            *[client('slow', options['drip']) for _ in range(options['slow_clients'])],
+            *[client('fast', 0) for _ in range(options['fast_clients'])],
+        )
+        return results
+
+    def report(self, name, results, options):
+        self.stdout.write(self.style.MIGRATE_HEADING(name))
+        for kind, (latencies, errors) in results.items():
+            stats = summarize(latencies, len(errors), options['duration'])
+            self.stdout.write(
+                f"  {kind:4}  {stats['rps']:7.1f} req/s  p50 {stats['p50_ms']:8.1f} ms  "
+                f"p95 {stats['p95_ms']:8.1f} ms  p99 {stats['p99_ms']:8.1f} ms  "
+                f"mean {stats['mean_ms']:8.1f} ms  {stats['errors']} errors"
+            )
@@ -0,0 +1,91 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from benchmarks.generator import ADJECTIVES, FEATURES, NOUNS
+from shop import search
+from shop.models import Product
+from shop.pagination import paginate_keyset
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Compare FTS5 search against the name__icontains lookup it replaced, and against '
+            'icontains on name and description, on a synthetic catalog. All synthetic rows '
+            'are rolled back when the run finishes, but the database stays write-locked until '
+            'then, so it only runs with DEBUG on.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--per-page', type=int, default=24)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('queries', nargs='*', default=['bottle', 'wireless head', 'usb-c charger', 'drone 4242', 'zzz'])
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG:
+            raise CommandError('benchmark_search seeds and locks the configured database; '
+                               'run it with DEBUG on, against a throwaway database.')
+        if not search.fts_available():
+            raise CommandError('Full-text search needs the SQLite backend with FTS5.')
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+        batch = []
+        for i in range(options['products']):
+            name = f'{rng.choice(ADJECTIVES)} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}'
+            description = ', '.join(rng.sample(FEATURES, 3)).capitalize() + '.'
+            batch.append(Product(name=name, price=Decimal(rng.randint(199, 99999)) / 100,
+                                 description=description, image=''))
+            if len(batch) >= 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
+        indexed = search.rebuild_index()
+        self.stdout.write(f'Loaded and indexed {indexed} products in {time.perf_counter() - started:.1f}s\n')
+
+        # "page" is one ranked page as served by product_list; "all" fetches
+        # every matching id, which is what the unpaginated view did. The view
+        # being replaced matched on the name only ("name"); "name+desc" also
+        # searches descriptions, as FTS5 does, for a like-for-like comparison.
+        per_page = options['per_page']
+        repeat = options['repeat']
+        columns = ['name page', 'name+desc page', 'fts5 page', 'name all', 'name+desc all', 'fts5 all']
+        self.stdout.write(f'{"query":<20} {"matches":>8} ' + ' '.join(f'{c:>14}' for c in columns) + '  (median ms)')
+        for query in options['queries']:
+            by_name = Product.objects.filter(name__icontains=query)
+            by_name_or_description = Product.objects.filter(Q(name__icontains=query) | Q(description__icontains=query))
+            matches = len(search.matching_ids(query))
+            timings = [
+                self.measure(repeat, lambda: paginate_keyset(by_name, None, per_page)),
+                self.measure(repeat, lambda: paginate_keyset(by_name_or_description, None, per_page)),
+                self.measure(repeat, lambda: search.search_products(query, None, per_page)),
+                self.measure(repeat, lambda: list(by_name.values_list('id', flat=True))),
+                self.measure(repeat, lambda: list(by_name_or_description.values_list('id', flat=True))),
+                self.measure(repeat, lambda: search.matching_ids(query)),
+            ]
+            self.stdout.write(f'{query:<20} {matches:>8} ' + ' '.join(f'{ms:>14.2f}' for ms in timings))
+
+    def measure(self, repeat, func):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,163 @@
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from benchmarks import driver
+from benchmarks.generator import USERNAME_PREFIX
+from benchmarks.servers import HOST, start_server
+from benchmarks.stats import summarize
+from shop.models import Product
+
+RESULTS_DIR = os.path.join(settings.BASE_DIR, 'benchmarks', 'results')
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in driver.JOURNEYS:
+            raise CommandError(f"Unknown journey {name!r}; choose from {', '.join(driver.JOURNEYS)}.")
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise CommandError(f'Invalid weight in {part!r}.')
+    return mix
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+class Command(BaseCommand):
+    help = ('Replay shopper journeys (browse, search, add to cart, checkout) with concurrent '
+            'virtual users against a local or remote server, report p50/p95/p99 latency and '
+            'requests per second per step, and save the results as JSON. Journeys place '
+            'orders, so point it at a database seeded with seed_benchmark_data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Base URL of a running server; by default one is started here.')
+        parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi')
+        parser.add_argument('--workers', type=int, default=16, help='Threads for the local WSGI server.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Virtual users.')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run.')
+        parser.add_argument('--mix', type=parse_mix, default='guest=3,customer=1',
+                            help='Journey weights, e.g. guest=3,customer=1,scraper=1.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help=f'Results file (default: a new file in {RESULTS_DIR}).')
+        parser.add_argument('--compare', help='Earlier results file to compare against.')
+
+    def handle(self, *args, **options):
+        mix = options['mix']
+        product_ids = list(Product.objects.order_by('id').values_list('id', flat=True)[:5000])
+        if not product_ids:
+            raise CommandError('There are no products; run seed_benchmark_data first.')
+        usernames = list(
+            get_user_model().objects.filter(username__startswith=USERNAME_PREFIX)
+            .order_by('id').values_list('username', flat=True)
+        )
+        if 'customer' in mix and not usernames:
+            self.stderr.write('No benchmark users found; running guest journeys only.')
+
+        stop = None
+        base_url = options['url']
+        if not base_url:
+            port, stop = start_server(options['server'], options['workers'])
+            base_url = f'http://{HOST}:{port}'
+        try:
+            started = time.perf_counter()
+            recorder, journeys = driver.run(
+                base_url, product_ids, usernames, concurrency=options['concurrency'],
+                duration=options['duration'], mix=mix, seed=options['seed'],
+            )
+            elapsed = time.perf_counter() - started
+        finally:
+            if stop:
+                stop()
+
+        steps = {
+            step: summarize(recorder.samples.get(step, []), recorder.errors.get(step, 0), elapsed)
+            for step in sorted(set(recorder.samples) | set(recorder.errors))
+        }
+        results = {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'target': options['url'] or options['server'],
+            'concurrency': options['concurrency'],
+            'duration': round(elapsed, 2),
+            'mix': mix,
+            'seed': options['seed'],
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'products': len(product_ids),
+                'users': len(usernames),
+            },
+            'journeys': journeys,
+            'total': summarize(
+                [latency for samples in recorder.samples.values() for latency in samples],
+                sum(recorder.errors.values()), elapsed,
+            ),
+            'steps': steps,
+        }
+        self.report(results)
+        if options['compare']:
+            with open(options['compare']) as fh:
+                self.compare(json.load(fh), results)
+        self.save(results, options['output'])
+
+    def report(self, results):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{results['target']}, {results['concurrency']} users, {results['duration']}s, "
+            f"journeys {results['journeys']}"
+        ))
+        self.stdout.write(f'{"step":<18} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>7}')
+        for step, stats in [*results['steps'].items(), ('TOTAL', results['total'])]:
+            self.stdout.write(
+                f"{step:<18} {stats['rps']:>8.1f} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} "
+                f"{stats['p99_ms']:>8.1f} {stats['errors']:>7}"
+            )
+
+    def compare(self, baseline, results):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Compared with {baseline.get('commit') or 'baseline'} ({baseline.get('timestamp', '?')})"
+        ))
+        self.stdout.write(f'{"step":<18} {"req/s":>16} {"p95 ms":>20}')
+        rows = [*results['steps'].items(), ('TOTAL', results['total'])]
+        for step, stats in rows:
+            before = baseline['total'] if step == 'TOTAL' else baseline.get('steps', {}).get(step)
+            if not before:
+                continue
+            self.stdout.write(
+                f"{step:<18} {stats['rps']:>8.1f} {self.delta(before['rps'], stats['rps']):>7} "
+                f"{stats['p95_ms']:>10.1f} {self.delta(before['p95_ms'], stats['p95_ms']):>9}"
+            )
+
+    def delta(self, before, after):
+        if not before:
+            return ''
+        return f'{(after - before) / before:+.0%}'
+
+    def save(self, results, path):
+        if not path:
+            os.makedirs(RESULTS_DIR, exist_ok=True)
+            stamp = results['timestamp'].replace(':', '').replace('-', '')[:15]
+            path = os.path.join(RESULTS_DIR, f"{stamp}-{results['commit'] or 'nocommit'}.json")
+        with open(path, 'w') as fh:
+            json.dump(results, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Results saved to {path}'))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from benchmarks import generator
+
+
+class Command(BaseCommand):
+    help = ('Bulk-create a seeded synthetic catalog with customers, wishlists and orders '
+            'for load tests. Run it against a scratch database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--wishlist-size', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        counts = generator.generate(
+            products=options['products'],
+            users=options['users'],
+            orders=options['orders'],
+            wishlist_size=options['wishlist_size'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        summary = ', '.join(f'{count} {name.replace("_", " ")}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {summary} in {time.perf_counter() - started:.1f}s. '
+            f'Users log in as {generator.USERNAME_PREFIX}<n> / {generator.PASSWORD}.'
+        ))
@@ -0,0 +1,70 @@
+import glob
+import json
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.stats import percentile
+
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LIST_RE = re.compile(r'IN \((?:\?, )*\?\)')
+
+
+def normalize_sql(sql):
+    """Collapse literals and IN lists so the same query shape groups together."""
+    sql = LITERAL_RE.sub('?', sql.replace('%s', '?'))
+    return IN_LIST_RE.sub('IN (...)', sql)
+
+
+class Command(BaseCommand):
+    help = 'Summarize the sampled request trace log: slowest endpoints and slowest queries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=settings.PROFILING_TRACE_FILE,
+                            help='Trace file; rotated backups next to it are read too.')
+        parser.add_argument('--limit', type=int, default=10)
+
+    def handle(self, *args, **options):
+        paths = sorted(glob.glob(glob.escape(options['file']) + '.*')) + [options['file']]
+        records = []
+        for path in paths:
+            try:
+                with open(path, encoding='utf-8') as fh:
+                    records.extend(json.loads(line) for line in fh if line.strip())
+            except FileNotFoundError:
+                continue
+            except ValueError as exc:
+                raise CommandError(f'{path} is not a JSONL trace file: {exc}')
+        if not records:
+            raise CommandError(f"No traces in {options['file']}; set PROFILING_SAMPLE_RATE to collect some.")
+
+        endpoints = defaultdict(list)
+        queries = defaultdict(list)
+        for record in records:
+            endpoints[f"{record['method']} {record['view'] or record['path']}"].append(record)
+            for query in record.get('slow_queries', []):
+                queries[normalize_sql(query['sql'])].append(query['ms'])
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Slowest endpoints ({len(records)} sampled requests)'))
+        self.stdout.write(f'{"endpoint":<40} {"count":>6} {"p50 ms":>8} {"p95 ms":>8} {"max ms":>8} '
+                          f'{"queries":>8} {"db ms":>7} {"tpl ms":>7}')
+        rows = []
+        for endpoint, items in endpoints.items():
+            totals = [item['total_ms'] for item in items]
+            rows.append((percentile(totals, 95), endpoint, items, totals))
+        for p95, endpoint, items, totals in sorted(rows, reverse=True)[:options['limit']]:
+            count = len(items)
+            self.stdout.write(
+                f'{endpoint[:40]:<40} {count:>6} {percentile(totals, 50):>8.1f} {p95:>8.1f} {max(totals):>8.1f} '
+                f"{sum(item['queries'] for item in items) / count:>8.1f} "
+                f"{sum(item['db_ms'] for item in items) / count:>7.1f} "
+                f"{sum(item['template_ms'] for item in items) / count:>7.1f}"
+            )
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Slowest queries'))
+        self.stdout.write(f'{"total ms":>9} {"count":>6} {"max ms":>8}  sql')
+        ranked = sorted(queries.items(), key=lambda item: sum(item[1]), reverse=True)
+        for sql, timings in ranked[:options['limit']]:
+            self.stdout.write(f'{sum(timings):>9.1f} {len(timings):>6} {max(timings):>8.1f}  {sql[:160]}')
@@ -0,0 +1,152 @@
+"""Local HTTP servers for load tests.
+
+``PooledWSGIServer`` behaves like a threaded WSGI worker with a fixed number
+of threads; ``ASGIServer`` speaks just enough HTTP/1.1 to drive an ASGI app
+from an event loop. Neither is meant to serve real traffic.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import unquote
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+
+HOST = '127.0.0.1'
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """wsgiref server with a fixed pool of worker threads, like a threaded WSGI worker."""
+
+    request_queue_size = 1024
+
+    def __init__(self, workers):
+        super().__init__((HOST, 0), QuietHandler)
+        self.pool = ThreadPoolExecutor(workers)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class ASGIServer:
+    """Just enough HTTP/1.1 to serve an ASGI app, one request per connection."""
+
+    def __init__(self, app):
+        self.app = app
+        self.loop = asyncio.new_event_loop()
+        self.started = threading.Event()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.started.wait()
+        return self.port
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        server = self.loop.run_until_complete(
+            asyncio.start_server(self.handle, HOST, 0, backlog=1024)
+        )
+        self.port = server.sockets[0].getsockname()[1]
+        self.started.set()
+        self.loop.run_forever()
+        server.close()
+        # Let requests that already sent their response finish cleaning up.
+        pending = asyncio.all_tasks(self.loop)
+        if pending:
+            self.loop.run_until_complete(asyncio.wait(pending, timeout=5))
+            for task in pending:
+                task.cancel()
+        self.loop.run_until_complete(server.wait_closed())
+        self.loop.close()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    async def handle(self, reader, writer):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            writer.close()
+            return
+        request_line, *lines = head.decode('latin-1').split('\r\n')
+        method, target, _ = request_line.split(' ', 2)
+        headers = []
+        for line in lines:
+            if line:
+                name, _, value = line.partition(':')
+                headers.append((name.strip().lower().encode('latin-1'), value.strip().encode('latin-1')))
+        length = int(dict(headers).get(b'content-length', b'0'))
+        body = await reader.readexactly(length) if length else b''
+        path, _, query = target.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': unquote(path),
+            'raw_path': path.encode('latin-1'),
+            'query_string': query.encode('latin-1'),
+            'root_path': '',
+            'headers': headers,
+            'client': writer.get_extra_info('peername')[:2],
+            'server': writer.get_extra_info('sockname')[:2],
+        }
+        received = asyncio.Event()
+
+        async def receive():
+            if not received.is_set():
+                received.set()
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                writer.write(
+                    f'HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n'.encode()
+                    + b''.join(name + b': ' + value + b'\r\n' for name, value in message.get('headers', []))
+                    + b'Connection: close\r\n\r\n'
+                )
+            elif message['type'] == 'http.response.body':
+                writer.write(message.get('body', b''))
+                await writer.drain()
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            writer.close()
+
+
+def start_server(kind, workers=16):
+    """Start a WSGI or ASGI server for the project; returns ``(port, stop)``."""
+    if kind == 'asgi':
+        server = ASGIServer(get_asgi_application())
+        return server.start(), server.stop
+
+    server = PooledWSGIServer(workers)
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def stop():
+        server.shutdown()
+        server.pool.shutdown()
+        server.server_close()
+    return server.server_port, stop
@@ -0,0 +1,22 @@
+import statistics
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def summarize(latencies, errors, duration):
+    """Request rate and latency percentiles (in ms) for one group of requests."""
+    ms = [latency * 1000 for latency in latencies]
+    return {
+        'requests': len(ms),
+        'errors': errors,
+        'rps': round(len(ms) / duration, 2) if duration else 0.0,
+        'p50_ms': round(percentile(ms, 50), 2),
+        'p95_ms': round(percentile(ms, 95), 2),
+        'p99_ms': round(percentile(ms, 99), 2),
+        'mean_ms': round(statistics.fmean(ms), 2) if ms else 0.0,
+    }
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,14 +40,17 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'shop',
     'accounts',
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
+    'shop.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'shop.middleware.CartMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -55,7 +59,7 @@ ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'shop.profiling.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -64,6 +68,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'shop.context_processors.shop',
             ],
         },
     },
@@ -82,6 +87,54 @@ DATABASES = {
     }
 }
 
+# DJANGO_DB_PROFILE=production switches to WAL journaling with tuned pragmas,
+# persistent connections, write transactions that take the lock up front, and
+# a read-only connection for catalog reads so they never queue behind writers.
+DATABASE_PROFILE = os.environ.get('DJANGO_DB_PROFILE', 'development')
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -32000,
+    'temp_store': 'MEMORY',
+    'mmap_size': 128 * 1024 * 1024,
+}
+
+if DATABASE_PROFILE == 'production':
+    DATABASES['default'].update({
+        'ENGINE': 'config.sqlite',
+        'CONN_MAX_AGE': None,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'pragmas': SQLITE_PRAGMAS, 'transaction_mode': 'IMMEDIATE'},
+    })
+    DATABASES['catalog_ro'] = {
+        'ENGINE': 'config.sqlite',
+        'NAME': Path(DATABASES['default']['NAME']).as_uri() + '?mode=ro',
+        'CONN_MAX_AGE': None,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pragmas': {
+                **{name: value for name, value in SQLITE_PRAGMAS.items() if name != 'journal_mode'},
+                'query_only': 'ON',
+            },
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['shop.db.CatalogReadRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# LocMemCache is per process; point this at memcached or Redis when running
+# several workers so they share catalog entries and the catalog version.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -119,12 +172,76 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# collectstatic writes content-hashed names plus .gz/.br variants; see
+# shop.staticfiles.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'shop.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = '/login/'
+
+# The db backend with load/save times reported to the profiling middleware.
+SESSION_ENGINE = 'shop.sessions'
+
+# Flash messages travel in a cookie so they never force a session write.
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Shop
+
+SHOP_PRODUCTS_PER_PAGE = 24
+# Lower bounds of the price facets; the last is open-ended. Run
+# ``manage.py rebuild_facets`` after changing them.
+SHOP_PRICE_BUCKETS = [0, 25, 50, 100, 250, 500]
+RECOMMENDATIONS_PER_PRODUCT = 4
+RECOMMENDATIONS_REBUILD_CHUNK_SIZE = 5000
+ORDER_HISTORY_PER_PAGE = 20
+
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = 60 * 60
+CATALOG_CACHE_LOCAL_SIZE = 2048
+
+CART_COOKIE_NAME = 'cart_id'
+# Guest carts left this long expire; ``manage.py clear_guest_carts`` deletes them.
+CART_GUEST_TIMEOUT = 60 * 60 * 24 * 30
+
+PRODUCT_IMAGE_WIDTHS = [200, 400, 800]
+# Unreferenced images touched more recently than this are left for media_gc.
+IMAGE_RELEASE_GRACE_SECONDS = 10 * 60
+
+CATALOG_READ_DATABASE = 'catalog_ro'
+DATABASE_LOCK_RETRIES = 4
+DATABASE_LOCK_BACKOFF = (0.05, 1.0)
+
+PAGE_CACHE_ALIAS = 'default'
+PAGE_CACHE_TIMEOUT = 10 * 60
+
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+API_EXPORT_CHUNK_SIZE = 2000
+ORDER_EXPORT_CHUNK_SIZE = 2000
+
+# Admin changelists over tables larger than this show an estimated count.
+ADMIN_EXACT_COUNT_THRESHOLD = 100000
+
+# Cache lifetimes for static files: hashed names never change content.
+STATIC_MAX_AGE = 60 * 60
+STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Request profiling: Server-Timing on every response, and a JSONL trace of a
+# sample of requests (e.g. PROFILING_SAMPLE_RATE=0.01) for trace_summary.
+PROFILING_SERVER_TIMING = True
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_TRACE_FILE = os.environ.get('PROFILING_TRACE_FILE', str(BASE_DIR / 'logs' / 'requests.jsonl'))
+PROFILING_TRACE_MAX_BYTES = 10 * 1024 * 1024
+PROFILING_TRACE_BACKUPS = 5
+PROFILING_SLOW_QUERIES = 5
@@ -0,0 +1,34 @@
+"""SQLite backend tuned for concurrent use.
+
+Accepts two extra ``OPTIONS`` on top of the stock backend:
+
+``pragmas``
+    ``{name: value}`` applied to every new connection, e.g. WAL journaling
+    and a busy timeout.
+``transaction_mode``
+    ``'IMMEDIATE'`` starts atomic blocks with ``BEGIN IMMEDIATE`` so a
+    transaction takes the write lock up front. With the default deferred
+    ``BEGIN`` a read-then-write transaction that loses the race to upgrade
+    its lock fails with "database is locked" without waiting at all.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop('pragmas', {})
+        self.transaction_mode = params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -1,9 +1,43 @@
-from django.test import TestCase, Client
-from django.urls import reverse
-from shop.models import Product, Order, Wishlist
-from django.contrib.auth import get_user_model
+import gzip
+import io
+import json
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.db import OperationalError, connections, transaction
+from django.test import AsyncClient, Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+from PIL import Image
+
+from benchmarks import budgets, generator
+from shop import catalog, facets, images, query_advisor, recommendations
+from shop.cart import get_priced_cart, price_cart
+from shop.db import retry_on_locked
+from shop.models import CartLine, GuestCart, Order, OrderItem, PriceBucket, Product, ProductPair, Wishlist
+from shop.pagination import encode_cursor, paginate_keyset
+from shop.search import search_products
+from shop.storage import product_image_storage
+from shop.views import place_order
+
 User = get_user_model()
 
 class E2ECommerceTest(TestCase):
@@ -65,6 +99,673 @@ class E2ECommerceTest(TestCase):
         response = self.client.get(reverse('order_history'))
         self.assertContains(response, 'John Doe')
 
+    def test_cart_pricing_uses_one_query(self):
+        cart = {str(self.product1.id): 2, str(self.product2.id): 1, '999999': 3}
+        with self.assertNumQueries(1):
+            priced = price_cart(cart)
+        self.assertEqual(priced.total, Decimal('139.97'))
+        self.assertEqual(priced.stale_ids, frozenset({'999999'}))
+        self.assertEqual([line.quantity for line in priced], [2, 1])
+
+    def test_keyset_pagination(self):
+        product3 = Product.objects.create(name='Leather Wallet', price=Decimal('24.99'), description='Genuine leather wallet.')
+        first = paginate_keyset(Product.objects.all(), None, 2)
+        self.assertEqual(first.items, [self.product1, self.product2])
+        self.assertTrue(first.has_next)
+        second = paginate_keyset(Product.objects.all(), first.next_cursor, 2)
+        self.assertEqual(second.items, [product3])
+        self.assertFalse(second.has_next)
+        by_price = paginate_keyset(Product.objects.all(), None, 2, ordering='-price')
+        self.assertEqual(by_price.items, [self.product2, self.product1])
+        rest = paginate_keyset(Product.objects.all(), by_price.next_cursor, 2, ordering='-price')
+        self.assertEqual(rest.items, [product3])
+
+        # Well-formed cursors holding values of the wrong type are a 400, not a 500.
+        self.client.login(username='testuser', password='testpass123')
+        bad = [
+            ('product_list', 'after', ['abc'], {}), ('product_list', 'after', [{'a': 1}], {}),
+            ('product_list', 'after', ['zz', 1], {'sort': 'price'}), ('product_list', 'after', ['x', 1], {'q': 'shirt'}),
+            ('api_products', 'after', ['abc'], {}), ('order_history', 'before', ['notadate', 1], {}),
+            ('order_history', 'before', ['2024-05-01T00:00:00+00:00', 'x'], {}), ('order_history', 'before', [1, 2], {}),
+        ]
+        for url, param, values, params in bad:
+            response = self.client.get(reverse(url), {**params, param: encode_cursor(values)})
+            self.assertEqual(response.status_code, 400, (url, values))
+
+    def test_full_text_search(self):
+        bottle = Product.objects.create(name='Sports Water Bottle', price=Decimal('9.99'), description='Stainless steel bottle.')
+        Product.objects.create(name='Travel Mug', price=Decimal('14.99'), description='Fits next to any bottle holder.')
+        results = search_products('bott')
+        self.assertEqual(results.items[0], bottle)
+        self.assertEqual(len(results.items), 2)
+        self.assertEqual(search_products('mesh sneak').items, [self.product2])
+        bottle.name = 'Sports Flask'
+        bottle.description = 'Stainless steel.'
+        bottle.save()
+        self.assertNotIn(bottle, search_products('bottle').items)
+        self.product2.delete()
+        self.assertEqual(search_products('sneakers').items, [])
+
+    def test_catalog_cache_invalidated_on_save(self):
+        ids = [self.product1.id, self.product2.id]
+        with self.assertNumQueries(1):
+            catalog.get_products(ids)
+        with self.assertNumQueries(0):
+            self.assertEqual(catalog.get_products(ids)[self.product1.id].name, 'Classic White Shirt')
+            self.assertEqual(catalog.get_product(self.product2.id), self.product2)
+        self.product1.name = 'Oxford Shirt'
+        self.product1.save()
+        self.assertEqual(catalog.get_product(self.product1.id).name, 'Oxford Shirt')
+        self.product2.delete()
+        self.assertIsNone(catalog.get_product(self.product2.id))
+
+    def test_anonymous_catalog_page_cache(self):
+        for product in (self.product1, self.product2):
+            product.image = 'products/placeholder.jpg'
+            product.save()
+        response = self.client.get(reverse('product_list'))
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'page-cache-csrf-token')
+        self.assertNotIn('csrftoken', response.cookies)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('product_list'))
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, 'Running Sneakers')
+
+        self.product2.name = 'Trail Sneakers'
+        self.product2.save()
+        self.assertContains(self.client.get(reverse('product_list')), 'Trail Sneakers')
+
+        session = self.client.session
+        session['cart'] = {str(self.product1.id): 3}
+        session.save()
+        fragment = self.client.get(reverse('session_fragment')).json()
+        self.assertEqual(fragment['cart_count'], 3)
+        self.assertTrue(fragment['csrf_token'])
+
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('product_list'))
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertNotContains(response, 'page-cache-csrf-token')
+
+    def test_wishlist_reads_do_not_create_rows(self):
+        for product in (self.product1, self.product2):
+            product.image = 'products/placeholder.jpg'
+            product.save()
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('product_list'))
+        self.assertEqual(response.context['wishlist_ids'], frozenset())
+        self.client.get(reverse('wishlist_view'))
+        self.client.post(reverse('remove_from_wishlist', args=[self.product1.id]))
+        self.assertFalse(Wishlist.objects.filter(user=self.user).exists())
+
+        self.client.post(reverse('add_to_wishlist', args=[self.product1.id]))
+        self.client.post(reverse('add_to_wishlist', args=[self.product1.id]))
+        response = self.client.get(reverse('product_list'))
+        self.assertEqual(response.context['wishlist_ids'], frozenset({self.product1.id}))
+        self.assertContains(response, 'bi-heart-fill', count=1)
+        response = self.client.get(reverse('wishlist_view'))
+        self.assertEqual(response.context['products'], [self.product1])
+        self.assertContains(response, '1 Items')
+
+    def test_checkout_creates_order_items(self):
+        self.client.login(username='testuser', password='testpass123')
+        session = self.client.session
+        session['cart'] = {str(self.product1.id): 2, str(self.product2.id): 1}
+        session.save()
+        self.client.post(reverse('checkout'), {
+            'name': 'John Doe',
+            'email': 'john@example.com',
+            'address': '123 Test Street',
+        })
+        order = Order.objects.get(user=self.user)
+        self.assertEqual(order.total_price, Decimal('139.97'))
+        items = {item.product_id: item for item in order.items.all()}
+        self.assertEqual(items[self.product1.id].quantity, 2)
+        self.assertEqual(items[self.product1.id].unit_price, Decimal('29.99'))
+        self.assertEqual(items[self.product2.id].product_name, 'Running Sneakers')
+
+        self.assertEqual(order.item_count, 3)
+        self.assertEqual(order.items_summary, '2 x Classic White Shirt, 1 x Running Sneakers')
+
+        self.product1.delete()
+        response = self.client.get(reverse('order_history'))
+        self.assertContains(response, '2 x Classic White Shirt')
+        self.assertNotContains(response, '$59.98')
+        response = self.client.get(reverse('order_detail', args=[order.id]))
+        self.assertContains(response, 'Classic White Shirt')
+        self.assertContains(response, '$59.98')
+        other = User.objects.create_user(username='other', password='otherpass123')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('order_detail', args=[order.id])).status_code, 404)
+
+    def test_order_history_pages_use_fixed_queries(self):
+        self.client.login(username='testuser', password='testpass123')
+        self.client.get(reverse('order_history'))
+        for i in range(25):
+            order = Order.objects.create(user=self.user, name=f'Order {i}', email='john@example.com', address='123 Test Street', total_price=Decimal('29.99'))
+            OrderItem.objects.create(order=order, product=self.product1, product_name='Classic White Shirt', unit_price=Decimal('29.99'), quantity=1)
+        # Session, user, cart badge and orders.
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('order_history'))
+        self.assertEqual(len(response.context['orders']), 20)
+        self.assertEqual(response.context['orders'][0].name, 'Order 24')
+        response = self.client.get(reverse('order_history'), {'before': response.context['next_cursor']})
+        self.assertEqual([order.name for order in response.context['orders']], [f'Order {i}' for i in range(4, -1, -1)])
+        self.assertEqual(response.context['next_cursor'], '')
+
+    def test_image_derivatives(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        buffer = io.BytesIO()
+        Image.new('RGB', (600, 300), 'red').save(buffer, 'JPEG')
+        with override_settings(MEDIA_ROOT=media_root):
+            self.product1.image = SimpleUploadedFile('shirt.jpg', buffer.getvalue(), content_type='image/jpeg')
+            self.product1.save()
+            written = images.generate_derivatives(self.product1.image.name)
+            self.assertEqual(len(written), 6)
+            with default_storage.open(images.derivative_name(self.product1.image.name, 200, 'webp')) as fh:
+                self.assertEqual(Image.open(fh).size, (200, 100))
+            with default_storage.open(images.derivative_name(self.product1.image.name, 800, 'jpg')) as fh:
+                self.assertEqual(Image.open(fh).size, (600, 300))
+            self.assertEqual(images.generate_derivatives(self.product1.image.name), [])
+            # Concurrent rebuilds replace the files in place: no suffixed copies are left behind.
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                list(pool.map(lambda _: images.generate_derivatives(self.product1.image.name, force=True), range(4)))
+            stored = [name for _, _, names in os.walk(os.path.join(media_root, 'derivatives')) for name in names]
+            self.assertEqual(sorted(stored), sorted(posixpath.basename(name) for name in written))
+            response = self.client.get(reverse('product_list'))
+            self.assertContains(response, 'type="image/webp"')
+            self.assertContains(response, 'loading="lazy"')
+
+    def test_import_products_command(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        for name in ('a.jpg', 'b.jpg'):
+            Image.new('RGB', (10, 10), 'blue').save(os.path.join(workdir, name))
+        feed = os.path.join(workdir, 'feed.csv')
+        with open(feed, 'w') as fh:
+            fh.write('name,price,description,image\n')
+            fh.write('Desk Lamp,19.50,LED lamp,a.jpg\n')
+            fh.write('Desk Fan,24.00,Quiet fan,b.jpg\n')
+            fh.write('Running Sneakers,79.99,Duplicate,a.jpg\n')
+            fh.write('Broken,abc,Bad price,a.jpg\n')
+            fh.write('Ghost,5.00,Missing image,missing.jpg\n')
+        out, err = io.StringIO(), io.StringIO()
+        with override_settings(MEDIA_ROOT=os.path.join(workdir, 'media')):
+            call_command('import_products', feed, image_root=workdir, batch_size=2, stdout=out, stderr=err)
+        self.assertIn('Created 2 products', out.getvalue())
+        self.assertIn('1 duplicates skipped, 2 invalid rows', out.getvalue())
+        lamp = Product.objects.get(name='Desk Lamp')
+        fan = Product.objects.get(name='Desk Fan')
+        self.assertEqual(lamp.price, Decimal('19.50'))
+        self.assertEqual(lamp.image.name, fan.image.name)
+        self.assertEqual(search_products('lamp').items, [lamp])
+        self.assertFalse(os.path.exists(feed + '.checkpoint'))
+
+    def test_content_addressed_images_are_shared_and_released(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with override_settings(MEDIA_ROOT=media_root):
+            for product in (self.product1, self.product2):
+                product.image = SimpleUploadedFile('photo.jpg', b'same bytes', content_type='image/jpeg')
+                product.save()
+            name = self.product1.image.name
+            self.assertEqual(self.product2.image.name, name)
+            self.assertRegex(name, r'^products/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+            storage = self.product1.image.storage
+            with self.captureOnCommitCallbacks(execute=True):
+                self.product1.delete()
+            self.assertTrue(storage.exists(name))
+            # Just written, so possibly about to be reused: kept for media_gc.
+            with self.captureOnCommitCallbacks(execute=True):
+                self.product2.image = SimpleUploadedFile('other.jpg', b'other bytes', content_type='image/jpeg')
+                self.product2.save()
+            self.assertTrue(storage.exists(name))
+            os.utime(storage.path(name), (0, 0))
+            self.assertTrue(images.release_image(name))
+            self.assertFalse(storage.exists(name))
+            self.assertTrue(storage.exists(self.product2.image.name))
+
+            # Storing bytes already there touches the file, so a release racing
+            # the upload keeps it.
+            other = self.product2.image.name
+            os.utime(storage.path(other), (0, 0))
+            self.assertEqual(storage.save('products/again.jpg', ContentFile(b'other bytes')), other)
+            Product.objects.filter(pk=self.product2.pk).update(image='')
+            self.assertFalse(images.release_image(other))
+            self.assertTrue(storage.exists(other))
+
+    def test_cart_store_for_guests_and_users(self):
+        self.client.post(reverse('add_to_cart', args=[self.product1.id]))
+        self.client.post(reverse('add_to_cart', args=[self.product1.id]))
+        self.client.post(reverse('add_to_cart', args=[self.product2.id]))
+        self.assertIn('cart_id', self.client.cookies)
+        self.assertNotIn('sessionid', self.client.cookies)
+        # Guest carts are rows, so emptying the shared cache loses nothing.
+        caches['default'].clear()
+        self.assertEqual(GuestCart.objects.get().items, {str(self.product1.id): 2, str(self.product2.id): 1})
+        response = self.client.get(reverse('cart_view'))
+        self.assertEqual([(line.product, line.quantity) for line in response.context['cart_items']],
+                         [(self.product1, 2), (self.product2, 1)])
+
+        self.client.post(reverse('login'), {'username': 'testuser', 'password': 'testpass123'})
+        self.assertEqual(self.client.cookies['cart_id'].value, '')
+        self.assertFalse(GuestCart.objects.exists())
+        self.assertEqual(dict(CartLine.objects.filter(cart__user=self.user).values_list('product_id', 'quantity')),
+                         {self.product1.id: 2, self.product2.id: 1})
+        self.client.post(reverse('add_to_cart', args=[self.product2.id]))
+        self.client.get(reverse('remove_from_cart', args=[self.product1.id]))
+        response = self.client.get(reverse('cart_view'))
+        self.assertEqual([(line.product, line.quantity) for line in response.context['cart_items']],
+                         [(self.product2, 2)])
+
+        self.client.logout()
+        self.assertEqual(len(self.client.get(reverse('cart_view')).context['cart_items']), 0)
+        self.client.login(username='testuser', password='testpass123')
+        self.assertEqual(len(self.client.get(reverse('cart_view')).context['cart_items']), 1)
+
+        guest = Client()
+        guest.post(reverse('add_to_cart', args=[self.product1.id]))
+        request = RequestFactory().post(reverse('checkout'))
+        request.COOKIES['cart_id'] = guest.cookies['cart_id'].value
+        request.user = AnonymousUser()
+        place_order(request, get_priced_cart(request), 'Guest', 'g@example.com', '2 Road')
+        # Cleared in the order's transaction, not when the response is sent.
+        self.assertFalse(GuestCart.objects.exists())
+        self.assertTrue(request._cart_store.dirty)
+
+    def test_sqlite_production_backend_and_lock_retry(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        connections.settings['tuned'] = connections.configure_settings({
+            'default': connections.settings['default'],
+            'tuned': {
+                'ENGINE': 'config.sqlite',
+                'NAME': os.path.join(tmp, 'tuned.sqlite3'),
+                'OPTIONS': {'pragmas': {'journal_mode': 'WAL', 'busy_timeout': 1234},
+                            'transaction_mode': 'IMMEDIATE'},
+            },
+        })['tuned']
+        self.addCleanup(connections.settings.pop, 'tuned')
+        self.addCleanup(connections['tuned'].close)
+        with connections['tuned'].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 1234)
+
+        calls = []
+
+        @retry_on_locked(using='tuned')
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return 'done'
+
+        with override_settings(DATABASE_LOCK_BACKOFF=(0, 0)), self.assertLogs('shop.db', 'WARNING'):
+            self.assertEqual(flaky(), 'done')
+            self.assertEqual(len(calls), 3)
+            # Inside a transaction the error goes straight to its owner.
+            calls.clear()
+            with self.assertRaises(OperationalError), transaction.atomic(using='tuned'):
+                flaky()
+            self.assertEqual(len(calls), 1)
+
+    async def test_async_catalog_views(self):
+        client = AsyncClient(HTTP_HOST='localhost')
+        response = await client.get(reverse('catalog_products'), {'q': 'sneakers'})
+        self.assertEqual(response.json()['products'][0]['name'], 'Running Sneakers')
+
+        await client.post(reverse('add_to_cart', args=[self.product1.id]))
+        response = await client.get(reverse('product_list'))
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertEqual(list(response.context['products']), [self.product1, self.product2])
+
+        await sync_to_async(client.force_login)(self.user)
+        wishlist = await Wishlist.objects.acreate(user=self.user)
+        await wishlist.products.aadd(self.product2)
+        response = await client.get(reverse('product_detail', args=[self.product2.id]))
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertEqual(response.context['wishlist_ids'], {self.product2.id})
+        self.assertEqual(response.context['cart_count'], 0)
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        # Every middleware runs natively async: none is adapted into a thread.
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
+        response = await client.get(reverse('product_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+        # Under ASGI the export streams from aiterator() rather than being collected first.
+        with override_settings(API_EXPORT_CHUNK_SIZE=1), warnings.catch_warnings():
+            warnings.simplefilter('error')
+            response = await client.get(reverse('api_products_export'), {'fields': 'id'})
+            chunks = [chunk async for chunk in response]
+        self.assertEqual([json.loads(chunk) for chunk in chunks], [{'id': self.product1.id}, {'id': self.product2.id}])
+
+    def test_benchmark_generator_is_seeded(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with override_settings(MEDIA_ROOT=media_root):
+            counts = generator.generate(products=30, users=4, orders=12, wishlist_size=2, seed=7)
+            names = list(Product.objects.filter(id__gt=self.product2.id).values_list('name', flat=True))
+            Product.objects.filter(id__gt=self.product2.id).delete()
+            generator.generate(products=30, users=4, orders=0, seed=7)
+        self.assertEqual(counts, {'products': 30, 'users': 4, 'wishlist_items': 8, 'orders': 12})
+        self.assertEqual(list(Product.objects.filter(id__gt=self.product2.id).values_list('name', flat=True)), names)
+        self.assertEqual(OrderItem.objects.filter(order__in=Order.objects.all()).values('order').distinct().count(), 12)
+        self.assertTrue(self.client.login(username=f'{generator.USERNAME_PREFIX}0', password=generator.PASSWORD))
+        self.assertEqual(len(search_products('bottle').items), Product.objects.filter(name__icontains='bottle').count())
+
+    def test_profiling_headers_and_trace_summary(self):
+        trace_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, trace_dir)
+        trace_file = os.path.join(trace_dir, 'requests.jsonl')
+        self.client.login(username='testuser', password='testpass123')
+        self.client.post(reverse('add_to_cart', args=[self.product1.id]))
+        with override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_TRACE_FILE=trace_file):
+            response = self.client.get(reverse('cart_view'))
+        timing = dict(re.findall(r'(\w+);dur=[\d.]+;desc="([^"]*)"', response['Server-Timing']))
+        self.assertEqual(set(timing), {'db', 'tpl', 'session', 'view', 'total'})
+        # Session, user and cart lines; the product comes from the catalog cache.
+        self.assertEqual(timing['db'], '3 queries')
+
+        with open(trace_file) as fh:
+            trace = json.loads(fh.readline())
+        self.assertEqual((trace['view'], trace['queries']), ('cart_view', 3))
+        self.assertGreater(trace['template_ms'], 0)
+        self.assertTrue(trace['slow_queries'])
+        out = io.StringIO()
+        call_command('trace_summary', file=trace_file, stdout=out)
+        self.assertIn('GET cart_view', out.getvalue())
+        self.assertIn('FROM "shop_cartline"', out.getvalue())
+
+    def test_static_assets_are_hashed_and_precompressed(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        with override_settings(STATIC_ROOT=static_root):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            response = self.client.get(reverse('cart_view'))
+            self.assertNotIn(b'<style>', response.content)
+            self.assertNotIn(b'https://', response.content.split(b'<body')[0])
+            url = re.search(rb'/static/css/base\.[0-9a-f]{12}\.css', response.content).group().decode()
+            original = open(os.path.join(static_root, url[len('/static/'):]), 'rb').read()
+
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+            self.assertEqual(response['Content-Encoding'], 'br')
+            self.assertEqual(response['Content-Type'], 'text/css')
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+            self.assertIn('max-age=31536000', response['Cache-Control'])
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertLess(int(response['Content-Length']), len(original))
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), original)
+
+            response = self.client.get('/static/css/base.css')
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertNotIn('immutable', response['Cache-Control'])
+            self.assertEqual(self.client.get('/static/../manage.py').status_code, 404)
+
+    def test_conditional_get(self):
+        response = self.client.get(reverse('product_list'))
+        etag = response['ETag']
+        self.assertFalse(response.has_header('Last-Modified'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('product_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        url = reverse('product_detail', args=[self.product1.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        detail_etag = response['ETag']
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=detail_etag).status_code, 304)
+        since = http_date(self.product1.updated_at.timestamp() + 60)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=since).status_code, 200)
+        self.product1.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], detail_etag)
+
+        # Deleting a product leaves the newest updated_at alone but not the count.
+        self.product2.delete()
+        self.assertEqual(self.client.get(reverse('product_list'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.client.login(username='testuser', password='testpass123')
+        self.assertFalse(self.client.get(url).has_header('ETag'))
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with override_settings(MEDIA_ROOT=media_root):
+            name = product_image_storage.save('products/shirt.jpg', ContentFile(b'not really a jpeg'))
+            response = self.client.get(settings.MEDIA_URL + name)
+            self.assertEqual(b''.join(response.streaming_content), b'not really a jpeg')
+            self.assertEqual(response['ETag'], '"%s"' % os.path.basename(name).split('.')[0])
+            self.assertIn('immutable', response['Cache-Control'])
+            response = self.client.get(settings.MEDIA_URL + name, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304)
+
+    def test_product_api_and_export(self):
+        response = self.client.get(reverse('api_products'), {'limit': 1, 'fields': 'name,price'})
+        self.assertEqual(response.json()['results'], [{'name': 'Classic White Shirt', 'price': '29.99'}])
+        etag = response['ETag']
+        response = self.client.get(response.json()['next'])
+        self.assertEqual(response.json(), {'results': [{'name': 'Running Sneakers', 'price': '79.99'}], 'next': None})
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('api_products'), {'limit': 1}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(reverse('api_products'), {'fields': 'name,cost'}).status_code, 400)
+
+        with override_settings(API_EXPORT_CHUNK_SIZE=1):
+            response = self.client.get(reverse('api_products_export'), {'fields': 'id,url'})
+            chunks = list(response.streaming_content)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([json.loads(chunk) for chunk in chunks], [
+            {'id': product.id, 'url': reverse('product_detail', args=[product.id])}
+            for product in (self.product1, self.product2)
+        ])
+
+    def test_order_export(self):
+        old = Order.objects.create(user=self.user, name='=HYPERLINK("x")', email='a@example.com',
+                                   address='1 Road', total_price=Decimal('10.00'))
+        Order.objects.filter(pk=old.pk).update(created_at='2020-01-01T00:00:00Z')
+        new = Order.objects.create(name='Guest', email='g@example.com', address='2 Road', total_price=Decimal('5.50'))
+
+        User.objects.create_superuser('admin', 'admin@example.com', 'adminpass123')
+        self.client.login(username='admin', password='adminpass123')
+        response = self.client.post(reverse('admin:shop_order_changelist'), {
+            'action': 'export_csv', 'select_across': 1, 'index': 0, '_selected_action': [new.pk],
+        })
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:4], ['id', 'created_at', 'user_id', 'username'])
+        self.assertEqual(len(lines), 3)
+        self.assertIn('"\'=HYPERLINK(""x"")"', lines[1])
+
+        out = io.StringIO()
+        call_command('export_orders', format='ndjson', since='2024-01-01', stdout=out)
+        self.assertEqual([json.loads(line)['id'] for line in out.getvalue().splitlines()], [new.id])
+        out = io.StringIO()
+        call_command('export_orders', format='ndjson', user='testuser', chunk_size=1, stdout=out)
+        row = json.loads(out.getvalue())
+        self.assertEqual((row['id'], row['username'], row['total_price']), (old.id, 'testuser', '10.00'))
+
+    def test_admin_order_list_on_large_tables(self):
+        orders = [
+            Order.objects.create(user=self.user if i % 2 else None, name=f'Customer {i}', email='c@example.com',
+                                 address='1 Road', total_price=Decimal('10.00'))
+            for i in range(4)
+        ]
+        Order.objects.filter(pk=orders[0].pk).update(created_at='2023-03-05T10:00:00Z')
+        Order.objects.filter(pk=orders[1].pk).update(created_at='2024-05-01T10:00:00Z')
+        orders[2].delete()
+        User.objects.create_superuser('admin', 'admin@example.com', 'adminpass123')
+        self.client.login(username='admin', password='adminpass123')
+        url = reverse('admin:shop_order_changelist')
+
+        response = self.client.get(url)
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertEqual(self._hierarchy(response), ['2023', '2024', str(orders[3].created_at.year)])
+        with override_settings(ADMIN_EXACT_COUNT_THRESHOLD=0):
+            response = self.client.get(url)
+            self.assertEqual(response.context['cl'].result_count, orders[3].pk)
+            # A filter makes the count exact again.
+            response = self.client.get(url, {'user': self.user.pk})
+            self.assertEqual(response.context['cl'].result_count, 2)
+
+        response = self.client.get(url, {'created_at__year': 2024})
+        self.assertEqual(self._hierarchy(response), ['May 2024'])
+        response = self.client.get(url, {'created_at__year': 2024, 'created_at__month': 5})
+        self.assertEqual(self._hierarchy(response), ['May 1'])
+
+        wishlist = Wishlist.objects.create(user=self.user)
+        response = self.client.get(reverse('admin:shop_wishlist_change', args=[wishlist.pk]))
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, self.product1.name)
+
+    def test_query_advisor(self):
+        Order.objects.create(user=self.user, name='John Doe', email='john@example.com', address='1 Road',
+                             total_price=Decimal('29.99'))
+        out = io.StringIO()
+        call_command('query_advisor', '--all', stdout=out)
+        self.assertIn('accounts.views.order_history', out.getvalue())
+        self.assertIn('USING INDEX order_user_created_idx', out.getvalue())
+
+        unindexed = Product.objects.filter(name='Shirt').order_by('description')
+        sql, = query_advisor.capture(lambda sample: list(unindexed), None)
+        finding = query_advisor.analyse(sql)
+        self.assertIn('full table scan of shop_product', finding.problems)
+        self.assertEqual(finding.suggestions, [('shop.Product', ['name', 'description'])])
+
+    def test_price_facets_and_sorting(self):
+        socks = Product.objects.create(name='Wool Socks', price=Decimal('4.99'), description='Warm socks.')
+
+        def counts():
+            return {facet['value']: facet['count'] for facet in facets.price_facets()}
+
+        self.assertEqual(counts(), {'0': 1, '25': 1, '50': 1, '100': 0, '250': 0, '500': 0})
+        self.product2.price = Decimal('120.00')
+        self.product2.save()
+        socks.delete()
+        self.assertEqual(counts(), {'0': 0, '25': 1, '50': 0, '100': 1, '250': 0, '500': 0})
+        cap = Product.objects.create(name='Cap', price=Decimal('9.00'), description='Cotton.')
+        PriceBucket.objects.filter(low=Decimal('25')).delete()
+        PriceBucket.objects.filter(low=Decimal('0')).update(product_count=0)
+        with self.assertLogs('shop.facets', 'WARNING'), self.assertNumQueries(8):
+            hat = Product.objects.create(name='Sun Hat', price=Decimal('29.00'), description='Wide brim.')
+        with self.assertLogs('shop.facets', 'WARNING'):
+            cap.delete()
+        self.assertEqual(counts(), {'0': 0, '25': 1, '50': 0, '100': 1, '250': 0, '500': 0})
+        hat.delete()
+        PriceBucket.objects.all().delete()
+        Product.objects.update(price_bucket=None)
+        call_command('rebuild_facets', stdout=io.StringIO())
+        self.assertEqual(counts()['100'], 1)
+        self.assertEqual(Product.objects.get(pk=self.product2.pk).price_bucket, Decimal('100'))
+
+        self.client.login(username='testuser', password='testpass123')
+        session = self.client.session
+        session['cart'] = {str(self.product1.id): 2}
+        session.save()
+        self.client.post(reverse('checkout'), {'name': 'John', 'email': 'john@example.com', 'address': '1 Road'})
+        self.assertEqual(Product.objects.get(pk=self.product1.pk).units_sold, 2)
+
+        def names(**params):
+            return [product.name for product in self.client.get(reverse('product_list'), params).context['products']]
+
+        self.assertEqual(names(sort='price_desc'), ['Running Sneakers', 'Classic White Shirt'])
+        self.assertEqual(names(sort='popular'), ['Classic White Shirt', 'Running Sneakers'])
+        anonymous = Client()
+        etag = anonymous.get(reverse('product_list'))['ETag']
+        response = anonymous.get(reverse('product_list'), {'sort': 'popular'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertEqual(names(sort='newest', price='100'), ['Running Sneakers'])
+        self.assertEqual(names(sort='price', price='250'), [])
+        self.assertContains(self.client.get(reverse('product_list')), '$100 to $250')
+        self.assertEqual(self.client.get(reverse('product_list'), {'sort': 'cheapest'}).status_code, 400)
+
+    def test_frequently_bought_together(self):
+        hat = Product.objects.create(name='Sun Hat', price=Decimal('19.99'), description='Wide brim.')
+        anonymous = Client()
+        etag = anonymous.get(reverse('product_detail', args=[self.product1.id]))['ETag']
+        self.client.login(username='testuser', password='testpass123')
+
+        def checkout(*products):
+            session = self.client.session
+            session['cart'] = {str(product.id): 1 for product in products}
+            session.save()
+            self.client.post(reverse('checkout'), {'name': 'John', 'email': 'john@example.com', 'address': '1 Road'})
+
+        def pairs():
+            return set(ProductPair.objects.values_list('product_id', 'other_id', 'count'))
+
+        checkout(self.product1, self.product2)
+        self.assertEqual(pairs(), {(self.product1.id, self.product2.id, 1), (self.product2.id, self.product1.id, 1)})
+        checkout(self.product1, self.product2, hat)
+        checkout(self.product1)
+        counted = pairs()
+        self.assertIn((self.product1.id, self.product2.id, 2), counted)
+        self.assertIn((hat.id, self.product1.id, 1), counted)
+        self.assertEqual(len(counted), 6)
+
+        ProductPair.objects.filter(product=hat).update(count=99)
+        seen = []
+
+        def progress(orders, last_id):
+            # The old counts stay visible until the rebuild swaps in the new ones.
+            seen.append(ProductPair.objects.filter(count__gte=99).count())
+            if orders == 1:
+                checkout(self.product2, hat)
+
+        recommendations.rebuild(chunk_size=1, progress=progress)
+        self.assertEqual(seen, [2, 2, 2])
+        counted = pairs()
+        self.assertIn((hat.id, self.product1.id, 1), counted)
+        self.assertIn((hat.id, self.product2.id, 2), counted)
+        self.assertEqual(len(counted), 6)
+
+        ProductPair.objects.all().delete()
+        call_command('rebuild_recommendations', chunk_size=1, stdout=io.StringIO())
+        self.assertEqual(pairs(), counted)
+        self.assertEqual(recommendations.get_recommendations(self.product1.id), [self.product2, hat])
+
+        response = anonymous.get(reverse('product_detail', args=[self.product1.id]))
+        self.assertEqual(response.context['recommendations'], [self.product2, hat])
+        self.assertContains(response, 'Frequently bought together')
+        self.assertNotEqual(response['ETag'], etag)
+        scarf = Product.objects.create(name='Silk Scarf', price=Decimal('35.00'), description='Never ordered.')
+        self.assertNotContains(anonymous.get(reverse('product_detail', args=[scarf.id])), 'Frequently bought together')
+
+    def _hierarchy(self, response):
+        return [choice['title'] for choice in date_hierarchy(response.context['cl'])['choices']]
+
     def tearDown(self):
         # Django test runner will delete the test database automatically
         pass
+
+
+class ViewBudgetTest(TestCase):
+    """Every view in benchmarks/budgets.json stays within budget at every data size."""
+
+    def test_views_within_budget(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        user = User.objects.create_user(username='budget', password='budgetpass123')
+        config = budgets.load_budgets()
+        results = {}
+        with override_settings(MEDIA_ROOT=media_root):
+            for size, spec in config['sizes'].items():
+                budgets.grow(user, spec)
+                results[size] = budgets.measure_views(self.client, user, config)
+        self.assertEqual(budgets.check(config, results), [])
+
+    def test_growing_query_count_fails(self):
+        config = {'views': {'cart_view': {'max_queries': 10, 'max_ms': 100}}}
+        results = {
+            'small': {'cart_view': budgets.Measurement(queries=4, ms=1.0, status=200)},
+            'large': {'cart_view': budgets.Measurement(queries=9, ms=1.0, status=200)},
+        }
+        self.assertEqual(budgets.check(config, results),
+                         ["cart_view: query count grows with data size {'small': 4, 'large': 9}"])
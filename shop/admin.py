@@ -1,19 +1,191 @@
+import datetime
+
+from django.conf import settings
 from django.contrib import admin
-from .models import Product, Order, Wishlist
+from django.contrib.auth import get_user_model
+from django.core.exceptions import BadRequest
+from django.db.models import Max, Min, QuerySet
+from django.utils import timezone
+from django.utils.html import format_html
+from . import exports, facets
+from .models import Product, Order, OrderItem, Cart, CartLine, Wishlist
+from .pagination import EstimatedCountPaginator
+
+
+class PriceRangeFilter(admin.SimpleListFilter):
+    """The shop's price facets, filtered through the indexed ``price_bucket``."""
+    title = 'price'
+    parameter_name = 'price_range'
+
+    def lookups(self, request, model_admin):
+        return [
+            (str(low), f'${low} to ${high}' if high is not None else f'${low} and up')
+            for low, high in facets.ranges()
+        ]
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        try:
+            bucket = facets.price_range(self.value())
+        except BadRequest:
+            return queryset.none()
+        return queryset.filter(**facets.price_filters(bucket))
+
+
+class CustomerFilter(admin.SimpleListFilter):
+    """Filter on one user without listing every user in the sidebar.
+
+    The choice only appears once a user is picked, from the links in the
+    order list.
+    """
+    title = 'user'
+    parameter_name = 'user'
+
+    def lookups(self, request, model_admin):
+        value = self.value()
+        if not value or not value.isdigit():
+            return []
+        user = get_user_model().objects.filter(pk=value).first()
+        return [(value, str(user))] if user else []
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if not value:
+            return queryset
+        return queryset.filter(user_id=value) if value.isdigit() else queryset.none()
+
+
+def _next_period(start, kind):
+    if kind == 'year':
+        return start.replace(year=start.year + 1)
+    if kind == 'month':
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start + datetime.timedelta(days=1)
+
+
+class DrilldownQuerySet(QuerySet):
+    """``datetimes()`` answered with an indexed EXISTS per candidate period.
+
+    The admin date hierarchy lists the years, months or days that have rows.
+    Django finds them with SELECT DISTINCT over a truncated timestamp, which
+    reads every row in range; probing each period between the first and last
+    row costs a few index seeks instead. Returns a list, not a queryset.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._bounds = {}
+
+    def _bound(self, aggregate):
+        # The date hierarchy and datetimes() both ask for the first and last
+        # row of the same changelist queryset; a search makes that a scan.
+        key = repr(aggregate)
+        if key not in self._bounds:
+            self._bounds[key] = super().aggregate(value=aggregate)['value']
+        return self._bounds[key]
+
+    def aggregate(self, *args, **kwargs):
+        # SQLite turns a lone MIN() or MAX() into an index seek, but scans
+        # when a query asks for both, as the date hierarchy does.
+        if not args and kwargs and all(isinstance(agg, (Min, Max)) for agg in kwargs.values()):
+            return {name: self._bound(agg) for name, agg in kwargs.items()}
+        return super().aggregate(*args, **kwargs)
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None, is_dst=None):
+        if kind not in ('year', 'month', 'day'):
+            return super().datetimes(field_name, kind, order, tzinfo, is_dst)
+        bounds = self.aggregate(first=Min(field_name), last=Max(field_name))
+        if bounds['first'] is None:
+            return []
+        tzinfo = tzinfo or (timezone.get_current_timezone() if settings.USE_TZ else None)
+        first, last = bounds['first'], bounds['last']
+        if tzinfo is not None:
+            first, last = first.astimezone(tzinfo), last.astimezone(tzinfo)
+        start = first.replace(
+            month=1 if kind == 'year' else first.month, day=1 if kind != 'day' else first.day,
+            hour=0, minute=0, second=0, microsecond=0,
+        )
+        periods = []
+        while start <= last:
+            end = _next_period(start, kind)
+            if self.filter(**{f'{field_name}__gte': start, f'{field_name}__lt': end}).exists():
+                periods.append(start)
+            start = end
+        return periods if order == 'ASC' else periods[::-1]
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables that grow without bound."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if not self.date_hierarchy:
+            return queryset
+        return DrilldownQuerySet(queryset.model, queryset.query, queryset.db)
+
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'price']
+class ProductAdmin(LargeTableAdmin):
+    list_display = ['name', 'price', 'units_sold', 'updated_at']
     search_fields = ['name', 'description']
-    list_filter = ['price']
+    list_filter = [PriceRangeFilter]
+    date_hierarchy = 'updated_at'
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    fields = ['product', 'product_name', 'unit_price', 'quantity']
+    readonly_fields = ['product', 'product_name', 'unit_price', 'quantity']
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
-    list_display = ['id', 'name', 'email', 'total_price', 'created_at', 'user']
-    list_filter = ['created_at', 'user']
+class OrderAdmin(LargeTableAdmin):
+    list_display = ['id', 'name', 'email', 'total_price', 'created_at', 'customer']
+    list_filter = ['created_at', CustomerFilter]
+    list_select_related = ['user']
     search_fields = ['name', 'email']
+    date_hierarchy = 'created_at'
+    ordering = ['-created_at', '-id']
+    autocomplete_fields = ['user']
+    inlines = [OrderItemInline]
+    actions = ['export_csv', 'export_ndjson']
+
+    @admin.display(description='user', ordering='user')
+    def customer(self, obj):
+        if obj.user is None:
+            return '-'
+        return format_html('<a href="?user={}">{}</a>', obj.user_id, obj.user)
+
+    # With "select all", the queryset is the whole filtered changelist: use
+    # the date and user filters to pick a date range or a customer.
+    @admin.action(description='Export selected orders as CSV')
+    def export_csv(self, request, queryset):
+        return exports.streaming_response(queryset, 'csv')
+
+    @admin.action(description='Export selected orders as NDJSON')
+    def export_ndjson(self, request, queryset):
+        return exports.streaming_response(queryset, 'ndjson')
+
+class CartLineInline(admin.TabularInline):
+    model = CartLine
+    extra = 0
+    autocomplete_fields = ['product']
+
+@admin.register(Cart)
+class CartAdmin(LargeTableAdmin):
+    list_display = ['user', 'updated_at']
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
+    inlines = [CartLineInline]
 
 @admin.register(Wishlist)
-class WishlistAdmin(admin.ModelAdmin):
+class WishlistAdmin(LargeTableAdmin):
     list_display = ['user', 'created_at']
-    filter_horizontal = ['products']
+    list_select_related = ['user']
+    autocomplete_fields = ['user', 'products']
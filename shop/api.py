@@ -0,0 +1,120 @@
+"""Read-only JSON API over the product catalog.
+
+``/api/products/`` serves keyset-paginated pages of products, and
+``/api/products/export.ndjson`` streams the whole table as one JSON object
+per line. Both accept ``fields=`` to pick a subset of ``FIELDS`` and carry an
+ETag taken from the catalog state, so unchanged data is a 304.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import etag, require_GET
+
+from . import catalog
+from .conditional import make_etag
+from .models import Product
+from .pagination import paginate_keyset
+from .storage import product_image_storage
+from .streaming import StreamingResponse, achunked, chunked
+
+# name -> (column, converter to a JSON value)
+FIELDS = {
+    'id': ('id', None),
+    'name': ('name', None),
+    'price': ('price', str),
+    'description': ('description', None),
+    'image': ('image', lambda name: product_image_storage.url(name) if name else None),
+    'url': ('id', lambda pk: reverse('product_detail', args=[pk])),
+    'updated_at': ('updated_at', lambda value: value.isoformat()),
+}
+DEFAULT_FIELDS = ['id', 'name', 'price', 'image', 'url']
+
+
+def requested_fields(request):
+    value = request.GET.get('fields')
+    if not value:
+        return DEFAULT_FIELDS
+    fields = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in FIELDS]
+    if unknown or not fields:
+        raise BadRequest(f"Unknown fields: {', '.join(unknown)}. Choose from {', '.join(FIELDS)}.")
+    return fields
+
+
+def page_size(request):
+    try:
+        limit = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest('limit must be an integer.')
+    return max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+
+def columns_for(fields):
+    return list(dict.fromkeys(['id'] + [FIELDS[name][0] for name in fields]))
+
+
+def serialize(row, fields):
+    data = {}
+    for name in fields:
+        column, convert = FIELDS[name]
+        value = row[column]
+        data[name] = convert(value) if convert and value is not None else value
+    return data
+
+
+def catalog_etag(request):
+    state = catalog.get_state()
+    return make_etag('api', state['count'], state['updated_at'])
+
+
+@require_GET
+@etag(catalog_etag)
+def products(request):
+    fields = requested_fields(request)
+    limit = page_size(request)
+    cursor = request.GET.get('after')
+
+    def load():
+        page = paginate_keyset(Product.objects.values(*columns_for(fields)), cursor, limit)
+        return [serialize(row, fields) for row in page.items], page.next_cursor
+
+    digest = hashlib.sha1(f"{','.join(fields)}\0{cursor or ''}".encode()).hexdigest()
+    results, next_cursor = catalog.get_or_load(f'api:{limit}:{digest}', load)
+    next_url = None
+    if next_cursor:
+        params = request.GET.copy()
+        params['after'] = next_cursor
+        next_url = f'{request.path}?{params.urlencode()}'
+    return JsonResponse({'results': results, 'next': next_url})
+
+
+def _export_rows(fields):
+    return Product.objects.order_by('id').values(*columns_for(fields))
+
+
+def export_lines(fields, chunk_size):
+    for row in _export_rows(fields).iterator(chunk_size=chunk_size):
+        yield json.dumps(serialize(row, fields), separators=(',', ':')) + '\n'
+
+
+async def aexport_lines(fields, chunk_size):
+    async for row in _export_rows(fields).aiterator(chunk_size=chunk_size):
+        yield json.dumps(serialize(row, fields), separators=(',', ':')) + '\n'
+
+
+@require_GET
+@etag(catalog_etag)
+def export_products(request):
+    """The whole catalog as NDJSON, streamed in constant memory under WSGI and ASGI."""
+    fields = requested_fields(request)
+    size = settings.API_EXPORT_CHUNK_SIZE
+    response = StreamingResponse(
+        chunked(export_lines(fields, size), size), achunked(aexport_lines(fields, size), size),
+        content_type='application/x-ndjson',
+    )
+    response['Content-Disposition'] = 'attachment; filename="products.ndjson"'
+    return response
@@ -0,0 +1,12 @@
+"""Async access to ``request.user`` (Django 5.0 adds ``request.auser()``)."""
+from asgiref.sync import sync_to_async
+
+
+async def aget_user(request):
+    """Load the lazy ``request.user`` in a worker thread and return it.
+
+    Reading the session and the user row are blocking queries; once loaded,
+    the user can be used freely from async code and templates.
+    """
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
@@ -0,0 +1,253 @@
+import re
+import secrets
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import catalog
+from .db import retry_on_locked
+from .models import Cart, GuestCart, Product
+from .models import CartLine as CartLineRow
+
+GUEST_CART_ID_RE = re.compile(r'^[A-Za-z0-9_-]{32}$')
+
+
+@dataclass(frozen=True)
+class CartLine:
+    product: Product
+    quantity: int
+
+    @property
+    def subtotal(self):
+        return self.product.price * self.quantity
+
+
+@dataclass(frozen=True)
+class PricedCart:
+    lines: list = field(default_factory=list)
+    total: Decimal = Decimal('0.00')
+    stale_ids: frozenset = frozenset()
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __iter__(self):
+        return iter(self.lines)
+
+
+def price_cart(cart):
+    """Resolve a ``{product_id: quantity}`` cart with a single query."""
+    quantities = {}
+    for product_id, quantity in cart.items():
+        try:
+            product_id, quantity = int(product_id), int(quantity)
+        except (TypeError, ValueError):
+            continue
+        if quantity > 0:
+            quantities[product_id] = quantity
+
+    products = catalog.get_products(list(quantities))
+    lines = []
+    total = Decimal('0.00')
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            continue
+        line = CartLine(product=product, quantity=quantity)
+        lines.append(line)
+        total += line.subtotal
+
+    stale_ids = frozenset(str(product_id) for product_id in cart) - {
+        str(line.product.id) for line in lines
+    }
+    return PricedCart(lines=lines, total=total, stale_ids=stale_ids)
+
+
+class UserCartStore:
+    """Cart lines stored in the database, one upserted row per product."""
+
+    def __init__(self, user):
+        self.user = user
+        self._items = None
+
+    def items(self):
+        if self._items is None:
+            self._items = dict(
+                CartLineRow.objects.filter(cart__user=self.user).values_list('product_id', 'quantity')
+            )
+        return self._items
+
+    def count(self):
+        return sum(self.items().values())
+
+    @retry_on_locked
+    def add(self, product_id, quantity=1):
+        cart, _ = Cart.objects.get_or_create(user=self.user)
+        lines = CartLineRow.objects.filter(cart=cart, product_id=product_id)
+        if not lines.update(quantity=F('quantity') + quantity):
+            try:
+                with transaction.atomic():
+                    CartLineRow.objects.create(cart=cart, product_id=product_id, quantity=quantity)
+            except IntegrityError:
+                lines.update(quantity=F('quantity') + quantity)
+        self._items = None
+
+    @retry_on_locked
+    def remove(self, product_id):
+        deleted, _ = CartLineRow.objects.filter(cart__user=self.user, product_id=product_id).delete()
+        self._items = None
+        return bool(deleted)
+
+    @retry_on_locked
+    def clear(self):
+        CartLineRow.objects.filter(cart__user=self.user).delete()
+        self._items = {}
+
+    def flush(self, response):
+        pass
+
+
+class GuestCartStore:
+    """Cart for anonymous visitors, kept in a ``GuestCart`` row under a cookie id.
+
+    Changes are buffered and written back once per request by
+    ``CartMiddleware``, so the session is never involved. ``clear()`` writes
+    through at once, so checkout can empty the cart in the order's transaction.
+    """
+
+    def __init__(self, request):
+        cart_id = request.COOKIES.get(settings.CART_COOKIE_NAME, '')
+        self.is_new = not GUEST_CART_ID_RE.match(cart_id)
+        self.cart_id = secrets.token_urlsafe(24) if self.is_new else cart_id
+        self._items = None
+        self.dirty = False
+        self.saved = False
+
+    def items(self):
+        if self._items is None:
+            self._items = {}
+            if not self.is_new:
+                cutoff = timezone.now() - timedelta(seconds=settings.CART_GUEST_TIMEOUT)
+                row = GuestCart.objects.filter(cart_id=self.cart_id, updated_at__gte=cutoff).first()
+                if row is not None:
+                    # JSON object keys come back as strings.
+                    self._items = {int(product_id): quantity for product_id, quantity in row.items.items()}
+        return self._items
+
+    def count(self):
+        return sum(self.items().values())
+
+    def add(self, product_id, quantity=1):
+        items = self.items()
+        items[product_id] = items.get(product_id, 0) + quantity
+        self.dirty, self.saved = True, False
+
+    def remove(self, product_id):
+        if self.items().pop(product_id, None) is None:
+            return False
+        self.dirty, self.saved = True, False
+        return True
+
+    def clear(self):
+        if self.items():
+            self._items = {}
+            self.save()
+            self.dirty = True
+
+    @retry_on_locked
+    def save(self):
+        if self._items:
+            GuestCart.objects.update_or_create(cart_id=self.cart_id, defaults={'items': self._items})
+        else:
+            GuestCart.objects.filter(cart_id=self.cart_id).delete()
+        self.saved = True
+
+    def flush(self, response):
+        if not self.dirty:
+            return
+        if not self.saved:
+            self.save()
+        if self._items:
+            response.set_cookie(
+                settings.CART_COOKIE_NAME, self.cart_id, max_age=settings.CART_GUEST_TIMEOUT,
+                httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+            )
+        else:
+            response.delete_cookie(settings.CART_COOKIE_NAME, samesite='Lax')
+        self.dirty = False
+
+
+def clear_expired_guest_carts():
+    """Delete guest carts untouched for ``CART_GUEST_TIMEOUT``; returns how many."""
+    cutoff = timezone.now() - timedelta(seconds=settings.CART_GUEST_TIMEOUT)
+    deleted, _ = GuestCart.objects.filter(updated_at__lt=cutoff).delete()
+    return deleted
+
+
+def _import_session_cart(request, store):
+    # Carts used to live in the session; move any left there into the store.
+    session = getattr(request, 'session', None)
+    if session is None or not session.session_key or 'cart' not in session:
+        return
+    for product_id, quantity in session.pop('cart').items():
+        try:
+            store.add(int(product_id), int(quantity))
+        except (TypeError, ValueError):
+            continue
+
+
+def get_cart_store(request):
+    store = getattr(request, '_cart_store', None)
+    if store is None:
+        if request.user.is_authenticated:
+            store = UserCartStore(request.user)
+        else:
+            store = GuestCartStore(request)
+        _import_session_cart(request, store)
+        request._cart_store = store
+    return store
+
+
+def merge_guest_cart(request, user):
+    """Fold the visitor's guest cart into ``user``'s stored cart after login."""
+    guest = GuestCartStore(request)
+    _import_session_cart(request, guest)
+    items = guest.items()
+    if items:
+        store = UserCartStore(user)
+        for product_id, quantity in items.items():
+            store.add(product_id, quantity)
+    guest.clear()
+    guest.dirty = not guest.is_new
+    request._cart_store = None
+    request._guest_cart = guest
+
+
+def get_priced_cart(request):
+    """Price the visitor's cart once per request, dropping stale product IDs.
+
+    The result is memoized on the request and reused as long as the cart is
+    unchanged, so a view can call this freely.
+    """
+    store = get_cart_store(request)
+    cart = store.items()
+    key = tuple(sorted(cart.items()))
+    cached = getattr(request, '_priced_cart', None)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    priced = price_cart(cart)
+    for product_id in priced.stale_ids:
+        store.remove(int(product_id))
+    if priced.stale_ids:
+        key = tuple(sorted(store.items().items()))
+    request._priced_cart = (key, priced)
+    return priced
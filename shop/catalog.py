@@ -0,0 +1,242 @@
+"""Two-tier cache for catalog reads.
+
+Every entry is keyed by the global catalog version, which is bumped whenever a
+``Product`` is saved or deleted, so invalidation never has to find individual
+keys: readers simply stop asking for the old ones. Lookups go through a small
+per-worker LRU first and the shared Django cache second.
+"""
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import Http404
+
+from .models import Product
+from .pagination import apaginate_keyset, paginate_keyset
+from .search import search_products
+
+VERSION_KEY = 'catalog:version'
+
+_MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+local_cache = LRUCache(settings.CATALOG_CACHE_LOCAL_SIZE)
+counters = Counter()
+
+
+def shared_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def get_version():
+    version = shared_cache().get(VERSION_KEY)
+    if version is None:
+        shared_cache().add(VERSION_KEY, 1, timeout=None)
+        version = shared_cache().get(VERSION_KEY, 1)
+    return version
+
+
+async def aget_version():
+    cache = shared_cache()
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, 1, timeout=None)
+        version = await cache.aget(VERSION_KEY, 1)
+    return version
+
+
+def bump_version():
+    cache = shared_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, timeout=None)
+    counters['invalidations'] += 1
+
+
+def invalidate():
+    """Drop every cached catalog entry, now and again once the transaction commits."""
+    bump_version()
+    transaction.on_commit(bump_version)
+
+
+def stats():
+    lookups = counters['local_hits'] + counters['shared_hits'] + counters['misses']
+    return {
+        'version': get_version(),
+        'local_size': len(local_cache),
+        'local_hits': counters['local_hits'],
+        'shared_hits': counters['shared_hits'],
+        'misses': counters['misses'],
+        'invalidations': counters['invalidations'],
+        'hit_ratio': (lookups - counters['misses']) / lookups if lookups else 0.0,
+    }
+
+
+def _versioned(key):
+    return f'catalog:{get_version()}:{key}'
+
+
+def get_or_load(key, loader):
+    key = _versioned(key)
+    value = local_cache.get(key, _MISSING)
+    if value is not _MISSING:
+        counters['local_hits'] += 1
+        return value
+    value = shared_cache().get(key, _MISSING)
+    if value is not _MISSING:
+        counters['shared_hits'] += 1
+    else:
+        counters['misses'] += 1
+        value = loader()
+        shared_cache().set(key, value, settings.CATALOG_CACHE_TIMEOUT)
+    local_cache.set(key, value)
+    return value
+
+
+async def aget_or_load(key, loader):
+    """``get_or_load`` for async callers; ``loader`` is a coroutine function."""
+    key = f'catalog:{await aget_version()}:{key}'
+    value = local_cache.get(key, _MISSING)
+    if value is not _MISSING:
+        counters['local_hits'] += 1
+        return value
+    value = await shared_cache().aget(key, _MISSING)
+    if value is not _MISSING:
+        counters['shared_hits'] += 1
+    else:
+        counters['misses'] += 1
+        value = await loader()
+        await shared_cache().aset(key, value, settings.CATALOG_CACHE_TIMEOUT)
+    local_cache.set(key, value)
+    return value
+
+
+def get_product(product_id):
+    return get_or_load(f'product:{product_id}', lambda: Product.objects.filter(id=product_id).first())
+
+
+def get_product_or_404(product_id):
+    product = get_product(product_id)
+    if product is None:
+        raise Http404('No Product matches the given query.')
+    return product
+
+
+async def aget_product(product_id):
+    return await aget_or_load(f'product:{product_id}', Product.objects.filter(id=product_id).afirst)
+
+
+async def aget_product_or_404(product_id):
+    product = await aget_product(product_id)
+    if product is None:
+        raise Http404('No Product matches the given query.')
+    return product
+
+
+def get_products(product_ids):
+    """Return ``{id: product}`` for the given ids, loading all misses in one query."""
+    version = get_version()
+    keys = {product_id: f'catalog:{version}:product:{product_id}' for product_id in product_ids}
+    found = {}
+    pending = {}
+    for product_id, key in keys.items():
+        value = local_cache.get(key, _MISSING)
+        if value is _MISSING:
+            pending[key] = product_id
+        else:
+            counters['local_hits'] += 1
+            found[product_id] = value
+
+    if pending:
+        shared = shared_cache().get_many(list(pending))
+        counters['shared_hits'] += len(shared)
+        for key, value in shared.items():
+            local_cache.set(key, value)
+            found[pending.pop(key)] = value
+
+    if pending:
+        counters['misses'] += len(pending)
+        loaded = Product.objects.in_bulk(list(pending.values()))
+        values = {key: loaded.get(product_id) for key, product_id in pending.items()}
+        shared_cache().set_many(values, settings.CATALOG_CACHE_TIMEOUT)
+        for key, value in values.items():
+            local_cache.set(key, value)
+            found[pending[key]] = value
+
+    return {product_id: product for product_id, product in found.items() if product is not None}
+
+
+def get_state():
+    """Product count and newest ``updated_at``; one of them moves on every save or delete."""
+    return get_or_load('state', lambda: Product.objects.aggregate(count=Count('id'), updated_at=Max('updated_at')))
+
+
+async def aget_state():
+    return await aget_or_load(
+        'state', lambda: Product.objects.aaggregate(count=Count('id'), updated_at=Max('updated_at'))
+    )
+
+
+def _page_key(query, cursor, per_page, ordering, filters):
+    filters = sorted((filters or {}).items())
+    digest = hashlib.sha1(f'{query}\0{cursor or ""}\0{ordering}\0{filters}'.encode()).hexdigest()
+    return f'page:{per_page}:{digest}'
+
+
+def get_product_page(query, cursor, per_page, ordering='id', filters=None):
+    """Cached page of the product grid, either browsing or searching.
+
+    ``ordering`` and ``filters`` (field lookups) apply when browsing; search
+    results are always in relevance order.
+    """
+    def load():
+        if query:
+            return search_products(query, cursor, per_page)
+        return paginate_keyset(Product.objects.filter(**filters or {}), cursor, per_page, ordering)
+
+    return get_or_load(_page_key(query, cursor, per_page, ordering, filters), load)
+
+
+async def aget_product_page(query, cursor, per_page, ordering='id', filters=None):
+    async def load():
+        if query:
+            # Search runs raw FTS5 SQL, which has no async API.
+            return await sync_to_async(search_products)(query, cursor, per_page)
+        return await apaginate_keyset(Product.objects.filter(**filters or {}), cursor, per_page, ordering)
+
+    return await aget_or_load(_page_key(query, cursor, per_page, ordering, filters), load)
@@ -0,0 +1,98 @@
+"""Conditional GET for anonymous catalog pages.
+
+Validators come from the catalog cache, so a visitor revalidating a page
+with ``If-None-Match`` or ``If-Modified-Since`` gets a 304 without the view,
+the template engine or, once the cache is warm, the database being touched.
+Pages for logged-in users carry their cart, wishlist and CSRF token and are
+always rendered in full.
+"""
+import asyncio
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from . import catalog, facets, recommendations
+from .auth import aget_user
+
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.sha1(':'.join(map(str, parts)).encode()).hexdigest()[:24]
+
+
+async def acatalog_validators(request):
+    # Sales reorder the popularity sort without moving the catalog state, so
+    # no validator could tell a browser its copy of that page is stale.
+    if request.GET.get('sort') in facets.SALES_SORTS:
+        return None, None
+    # Deleting a product does not move the newest updated_at, so the product
+    # grid gets an ETag only: a Last-Modified would keep showing it.
+    state = await catalog.aget_state()
+    return make_etag('catalog', state['count'], state['updated_at']), None
+
+
+async def aproduct_validators(request, product_id):
+    product = await catalog.aget_product(product_id)
+    if product is None:
+        return None, None
+    # The page lists the products bought with this one, so they validate it
+    # too. Orders change that list without moving any updated_at, so the page
+    # gets an ETag only: a Last-Modified would keep showing the old list.
+    recommended = await recommendations.aget_recommendations(product.id)
+    etag = make_etag('product', product.id, product.updated_at, *[(p.id, p.updated_at) for p in recommended])
+    return etag, None
+
+
+def _not_modified(request, etag, last_modified):
+    return get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+
+
+def _with_validators(response, etag, last_modified):
+    if response.status_code not in (200, 304):
+        return response
+    if etag and not response.has_header('ETag'):
+        response['ETag'] = etag
+    if last_modified and not response.has_header('Last-Modified'):
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Let browsers keep the page but ask again each time; the answer is cheap.
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def conditional_page(validators):
+    """Answer conditional GETs from anonymous visitors before the view runs.
+
+    ``validators(request, *args, **kwargs)`` returns ``(etag, last_modified)``,
+    either of which may be ``None``; it is a coroutine function for async views.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                user = await aget_user(request)
+                if request.method not in ('GET', 'HEAD') or user.is_authenticated:
+                    return await view(request, *args, **kwargs)
+                etag, last_modified = await validators(request, *args, **kwargs)
+                response = _not_modified(request, etag, last_modified)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return _with_validators(response, etag, last_modified)
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            etag, last_modified = validators(request, *args, **kwargs)
+            response = _not_modified(request, etag, last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return _with_validators(response, etag, last_modified)
+
+        return wrapper
+
+    return decorator
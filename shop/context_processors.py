@@ -0,0 +1,26 @@
+from asgiref.sync import sync_to_async
+
+from .cart import get_cart_store
+from .page_cache import CSRF_PLACEHOLDER
+
+
+def cart_count(request):
+    return get_cart_store(request).count()
+
+
+def shop(request):
+    if getattr(request, 'page_cached', False):
+        return {'page_cached': True, 'csrf_token': CSRF_PLACEHOLDER}
+    return {'cart_count': lambda: cart_count(request)}
+
+
+async def ashop(request):
+    """``shop`` for async views, with the cart count loaded up front.
+
+    Templates rendered from async code cannot run queries, so the lazy cart
+    count is resolved in a worker thread and passed in the view's context.
+    """
+    context = shop(request)
+    if 'cart_count' in context:
+        context['cart_count'] = await sync_to_async(cart_count)(request)
+    return context
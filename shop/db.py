@@ -0,0 +1,68 @@
+"""Database helpers for running on SQLite under concurrent load."""
+import functools
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+logger = logging.getLogger(__name__)
+
+CATALOG_MODELS = {'shop.product'}
+
+
+def is_locked_error(exc):
+    return 'database is locked' in str(exc) or 'database table is locked' in str(exc)
+
+
+def retry_on_locked(func=None, *, using=DEFAULT_DB_ALIAS):
+    """Retry ``func`` with jittered exponential backoff while SQLite is locked.
+
+    Only the outermost call retries: inside an atomic block the enclosing
+    transaction is already broken, so the error propagates to whoever owns
+    it. Wrapped functions must be safe to run again after a failed attempt.
+    """
+    if func is None:
+        return functools.partial(retry_on_locked, using=using)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        attempts = settings.DATABASE_LOCK_RETRIES + 1
+        base_delay, max_delay = settings.DATABASE_LOCK_BACKOFF
+        for attempt in range(attempts):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as exc:
+                if (not is_locked_error(exc) or attempt == attempts - 1
+                        or connections[using].in_atomic_block):
+                    raise
+                delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+                logger.warning('%s: database is locked, retrying in %.3fs', func.__qualname__, delay)
+                time.sleep(delay)
+    return wrapper
+
+
+class CatalogReadRouter:
+    """Send catalog reads to the read-only ``CATALOG_READ_DATABASE`` alias.
+
+    Reads made while the default connection is inside a transaction stay on
+    it, so a request always sees its own uncommitted writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower not in CATALOG_MODELS:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return settings.CATALOG_READ_DATABASE
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases open the same database file.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
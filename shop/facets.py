@@ -0,0 +1,192 @@
+"""Price facets and sort orders for the product grid.
+
+Facet counts are read from ``PriceBucket``, one row per range in
+``SHOP_PRICE_BUCKETS``. The product signals keep the rows current and
+``manage.py rebuild_facets`` recounts them, so the grid never runs a GROUP BY.
+Each product also carries the bucket it falls in, so a facet is an equality
+that leads the ``(price_bucket, id)`` and ``(price_bucket, units_sold, id)``
+indexes; price-ordered pages use a range on ``(price, id)`` instead. Every
+sorted, filtered page is an index seek.
+
+Popularity is ``Product.units_sold``, raised as orders are placed. Orders do
+not invalidate the catalog cache, so a popularity page can be served from it
+for up to ``CATALOG_CACHE_TIMEOUT``, and an anonymous copy of that from the
+page cache for up to ``PAGE_CACHE_TIMEOUT`` more. Those pages carry no ETag
+or Last-Modified, since the catalog state they would come from does not move
+with sales, so browsers always fetch them again.
+"""
+import bisect
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from django.db import transaction
+from django.db.models import Case, Count, F, PositiveIntegerField, Sum, Value, When
+
+from . import catalog
+from .models import OrderItem, PriceBucket, Product
+
+logger = logging.getLogger(__name__)
+
+# sort= parameter -> (keyset ordering, label)
+SORTS = {
+    '': ('id', 'Catalog order'),
+    'price': ('price', 'Price: low to high'),
+    'price_desc': ('-price', 'Price: high to low'),
+    'newest': ('-id', 'Newest'),
+    'popular': ('-units_sold', 'Most popular'),
+}
+# Sorts whose order changes as orders are placed.
+SALES_SORTS = {'popular'}
+
+
+def ranges():
+    """``(low, high)`` for each bucket; ``high`` is None for the last one."""
+    edges = [Decimal(str(edge)) for edge in settings.SHOP_PRICE_BUCKETS]
+    return list(zip(edges, edges[1:] + [None]))
+
+
+def bucket_for(price):
+    """Lower bound of the bucket ``price`` falls in, or None below the first."""
+    edges = [low for low, _ in ranges()]
+    index = bisect.bisect_right(edges, Decimal(str(price))) - 1
+    return edges[index] if index >= 0 else None
+
+
+def ordering(sort):
+    try:
+        return SORTS[sort or ''][0]
+    except KeyError:
+        raise BadRequest(f"Unknown sort: {sort}. Choose from {', '.join(filter(None, SORTS))}.")
+
+
+def price_range(value):
+    """The ``(low, high)`` bucket named by a ``price=`` parameter, or None for any price."""
+    if not value:
+        return None
+    for low, high in ranges():
+        if value == str(low):
+            return low, high
+    raise BadRequest(f'Unknown price range: {value}.')
+
+
+def _range(low, high):
+    return {'price__gte': low, 'price__lt': high} if high is not None else {'price__gte': low}
+
+
+def price_filters(bucket, ordering='id'):
+    """Field lookups selecting the products in ``bucket`` for a page in ``ordering``."""
+    if bucket is None:
+        return {}
+    low, high = bucket
+    if ordering.lstrip('-') == 'price':
+        return _range(low, high)
+    return {'price_bucket': low}
+
+
+def _facets(counts):
+    return [
+        {'value': str(low), 'low': low, 'high': high, 'count': counts.get(low, 0)}
+        for low, high in ranges()
+    ]
+
+
+def price_facets():
+    """Buckets with their product counts, from the summary table via the catalog cache."""
+    return catalog.get_or_load(
+        'price_facets', lambda: _facets(dict(PriceBucket.objects.values_list('low', 'product_count')))
+    )
+
+
+async def aprice_facets():
+    async def load():
+        rows = PriceBucket.objects.values_list('low', 'product_count')
+        return _facets({low: count async for low, count in rows})
+
+    return await catalog.aget_or_load('price_facets', load)
+
+
+def adjust(price, delta):
+    """Add ``delta`` to the count of the bucket ``price`` falls in.
+
+    A missing row is created and a count that would go below zero stops at
+    zero; ``manage.py rebuild_facets`` recounts buckets that have drifted.
+    """
+    low = bucket_for(price)
+    if low is None:
+        return
+    updated = PriceBucket.objects.filter(low=low, product_count__gte=max(-delta, 0)).update(
+        product_count=F('product_count') + delta
+    )
+    if updated:
+        return
+    high = dict(ranges())[low]
+    bucket, created = PriceBucket.objects.get_or_create(
+        low=low, defaults={'high': high, 'product_count': max(delta, 0)}
+    )
+    if created:
+        logger.warning('Price bucket %s was missing; run rebuild_facets to recount it.', low)
+    else:
+        PriceBucket.objects.filter(pk=bucket.pk).update(product_count=0)
+        logger.warning('Price bucket %s would drop below zero; run rebuild_facets to recount it.', low)
+
+
+def move(old_price, new_price):
+    if bucket_for(old_price) != bucket_for(new_price):
+        adjust(old_price, -1)
+        adjust(new_price, 1)
+
+
+def rebuild_buckets():
+    """Reassign every product to its bucket and recount the buckets."""
+    edges = ranges()
+    with transaction.atomic():
+        if edges:
+            Product.objects.filter(price__lt=edges[0][0]).exclude(price_bucket=None).update(price_bucket=None)
+        for low, high in edges:
+            Product.objects.filter(**_range(low, high)).exclude(price_bucket=low).update(price_bucket=low)
+        counts = dict(
+            Product.objects.exclude(price_bucket=None).order_by()
+            .values_list('price_bucket').annotate(count=Count('id'))
+        )
+        buckets = [PriceBucket(low=low, high=high, product_count=counts.get(low, 0)) for low, high in edges]
+        PriceBucket.objects.all().delete()
+        PriceBucket.objects.bulk_create(buckets)
+    catalog.invalidate()
+    return buckets
+
+
+def record_sales(items):
+    """Add the quantities of a placed order's items to their products' ``units_sold``, in one UPDATE."""
+    sold = {}
+    for item in items:
+        if item.product_id:
+            sold[item.product_id] = sold.get(item.product_id, 0) + item.quantity
+    if not sold:
+        return
+    units = Case(*[When(id=product_id, then=Value(quantity)) for product_id, quantity in sold.items()],
+                 default=Value(0), output_field=PositiveIntegerField())
+    Product.objects.filter(id__in=sold).update(units_sold=F('units_sold') + units)
+
+
+def rebuild_popularity(batch_size=1000):
+    """Recompute ``units_sold`` from every order item; returns how many products have sold."""
+    totals = (
+        OrderItem.objects.filter(product__isnull=False).order_by()
+        .values('product_id').annotate(units=Sum('quantity'))
+    )
+    count = 0
+    with transaction.atomic():
+        Product.objects.exclude(units_sold=0).update(units_sold=0)
+        batch = []
+        for row in totals.iterator(chunk_size=batch_size):
+            batch.append(Product(id=row['product_id'], units_sold=row['units']))
+            if len(batch) >= batch_size:
+                Product.objects.bulk_update(batch, ['units_sold'])
+                count += len(batch)
+                batch = []
+        Product.objects.bulk_update(batch, ['units_sold'])
+        count += len(batch)
+    catalog.invalidate()
+    return count
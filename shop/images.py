@@ -0,0 +1,156 @@
+"""Resized JPEG and WebP derivatives of product images.
+
+Every uploaded image gets one JPEG and one WebP per width in
+``PRODUCT_IMAGE_WIDTHS``, stored next to each other under ``derivatives/``.
+Images are never upscaled: widths larger than the original reuse its size.
+Builds for the same image are serialized, and each derivative replaces the
+previous one in a single rename.
+"""
+import io
+import logging
+import os
+import posixpath
+import tempfile
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, UnidentifiedImageError
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 78, 'method': 4}),
+}
+
+
+def derivative_name(name, width, ext):
+    stem = posixpath.splitext(name)[0]
+    return f'derivatives/{stem}-{width}w.{ext}'
+
+
+# A fixed set of locks shared out by name, so the set does not grow with the
+# catalog. Names that share a lock only wait on each other's builds.
+_locks = [threading.Lock() for _ in range(64)]
+
+
+def _lock_for(name):
+    return _locks[hash(name) % len(_locks)]
+
+
+def _replace(storage, name, data):
+    """Write ``data`` to ``name`` in one step, replacing any file already there."""
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        if storage.exists(name):
+            storage.delete(name)
+        return storage.save(name, ContentFile(data))
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.derivative-')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(data)
+        if storage.file_permissions_mode is not None:
+            os.chmod(tmp_path, storage.file_permissions_mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return name
+
+
+def has_derivatives(name, storage=default_storage):
+    return storage.exists(derivative_name(name, settings.PRODUCT_IMAGE_WIDTHS[0], 'webp'))
+
+
+def generate_derivatives(name, force=False, storage=default_storage):
+    """Write every derivative of the stored image ``name``; returns the names written."""
+    # Imports and on_commit hooks can build the same image at once; the
+    # second build waits and then finds the derivatives in place.
+    with _lock_for(name):
+        if not force and has_derivatives(name, storage):
+            return []
+        return _generate(name, storage)
+
+
+def _generate(name, storage):
+    try:
+        with storage.open(name, 'rb') as fh:
+            original = Image.open(fh)
+            original.load()
+    except (OSError, UnidentifiedImageError) as exc:
+        logger.warning('Cannot generate derivatives for %s: %s', name, exc)
+        return []
+
+    if original.mode not in ('RGB', 'L'):
+        original = original.convert('RGB')
+
+    written = []
+    for width in sorted(settings.PRODUCT_IMAGE_WIDTHS, reverse=True):
+        image = original
+        if original.width > width:
+            height = round(original.height * width / original.width)
+            image = original.resize((width, height), Image.LANCZOS)
+        for ext, (fmt, options) in FORMATS.items():
+            target = derivative_name(name, width, ext)
+            buffer = io.BytesIO()
+            image.save(buffer, fmt, **options)
+            written.append(_replace(storage, target, buffer.getvalue()))
+    return written
+
+
+def derivative_names(name):
+    return [
+        derivative_name(name, width, ext)
+        for width in settings.PRODUCT_IMAGE_WIDTHS
+        for ext in FORMATS
+    ]
+
+
+def release_image(name, grace=None):
+    """Delete a stored image and its derivatives once no product references it.
+
+    An upload that reuses a stored file refreshes its mtime but references
+    it only when its transaction commits, so a file touched in the last
+    ``grace`` seconds (``IMAGE_RELEASE_GRACE_SECONDS``) is kept for
+    ``manage.py media_gc``. The file is renamed aside before that check: an
+    upload arriving from then on finds it gone and writes a fresh copy.
+    """
+    grace = settings.IMAGE_RELEASE_GRACE_SECONDS if grace is None else grace
+    if not name or Product.objects.filter(image=name).exists():
+        return False
+    path = Product._meta.get_field('image').storage.path(name)
+    released = f'{path}.{uuid.uuid4().hex}.released'
+    try:
+        os.replace(path, released)
+    except FileNotFoundError:
+        return False
+    if os.stat(released).st_mtime > time.time() - grace:
+        # Names are content hashes, so this puts back the same bytes even if
+        # an upload has just written a fresh copy.
+        os.replace(released, path)
+        return False
+    with _lock_for(name):
+        for derivative in derivative_names(name):
+            default_storage.delete(derivative)
+    os.remove(released)
+    if os.path.exists(path):
+        # Uploaded again while being released: its derivatives are needed.
+        generate_derivatives(name)
+    return True
+
+
+def srcset(name, ext):
+    return ', '.join(
+        f'{default_storage.url(derivative_name(name, width, ext))} {width}w'
+        for width in settings.PRODUCT_IMAGE_WIDTHS
+    )
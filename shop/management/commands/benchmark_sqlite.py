@@ -0,0 +1,164 @@
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+from shop.db import is_locked_error, retry_on_locked
+
+SCHEMA = [
+    'CREATE TABLE product (id INTEGER PRIMARY KEY, name TEXT NOT NULL, price REAL NOT NULL)',
+    'CREATE TABLE orders (id INTEGER PRIMARY KEY, total REAL NOT NULL, created REAL NOT NULL)',
+    'CREATE TABLE order_line (id INTEGER PRIMARY KEY, order_id INTEGER NOT NULL, '
+    'product_id INTEGER NOT NULL, quantity INTEGER NOT NULL)',
+    'CREATE INDEX order_line_order ON order_line (order_id)',
+]
+
+
+def profiles(path):
+    """The stock configuration next to the production profile from settings."""
+    return {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': path,
+        },
+        'production': {
+            'ENGINE': 'config.sqlite',
+            'NAME': path,
+            'CONN_MAX_AGE': None,
+            'OPTIONS': {'pragmas': settings.SQLITE_PRAGMAS, 'transaction_mode': 'IMMEDIATE'},
+        },
+    }
+
+
+def register_alias(alias, config):
+    # Benchmark databases are added next to the project's own for the run only.
+    connections.settings[alias] = connections.configure_settings(
+        {'default': settings.DATABASES['default'], alias: config}
+    )[alias]
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = ('Run concurrent checkout-style writers and catalog readers against a scratch '
+            'SQLite file, once with the stock settings and once with the production '
+            'profile (WAL, pragmas, BEGIN IMMEDIATE, lock retries, persistent connections).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per profile.')
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--profile', choices=['default', 'production'], action='append',
+                            help='Profile to run (repeatable); both by default.')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in options['profile'] or ['default', 'production']:
+                path = os.path.join(tmp, f'{name}.sqlite3')
+                alias = f'benchmark_{name}'
+                register_alias(alias, profiles(path)[name])
+                try:
+                    self.populate(alias, options['products'])
+                    results = self.run(alias, name == 'production', options)
+                finally:
+                    connections[alias].close()
+                    del connections.settings[alias]
+                self.report(name, results, options['duration'])
+
+    def populate(self, alias, count):
+        with connections[alias].cursor() as cursor:
+            for statement in SCHEMA:
+                cursor.execute(statement)
+            cursor.executemany(
+                'INSERT INTO product (id, name, price) VALUES (%s, %s, %s)',
+                [(i, f'Product {i}', round(random.uniform(1, 500), 2)) for i in range(1, count + 1)],
+            )
+        connections[alias].close()
+
+    def run(self, alias, production, options):
+        products = options['products']
+        deadline = time.perf_counter() + options['duration']
+        results = {'write': ([], []), 'read': ([], [])}
+        lock = threading.Lock()
+
+        def checkout():
+            with transaction.atomic(using=alias):
+                with connections[alias].cursor() as cursor:
+                    ids = random.sample(range(1, products + 1), 3)
+                    cursor.execute(
+                        'SELECT SUM(price) FROM product WHERE id IN (%s, %s, %s)', ids
+                    )
+                    total = cursor.fetchone()[0]
+                    cursor.execute(
+                        'INSERT INTO orders (total, created) VALUES (%s, %s)', [total, time.time()]
+                    )
+                    order_id = cursor.lastrowid
+                    cursor.executemany(
+                        'INSERT INTO order_line (order_id, product_id, quantity) VALUES (%s, %s, 1)',
+                        [(order_id, product_id) for product_id in ids],
+                    )
+
+        def browse():
+            with connections[alias].cursor() as cursor:
+                offset = random.randrange(max(1, products - 24))
+                cursor.execute('SELECT id, name, price FROM product ORDER BY id LIMIT 24 OFFSET %s', [offset])
+                cursor.fetchall()
+                cursor.execute('SELECT COUNT(*) FROM orders')
+                cursor.fetchone()
+
+        if production:
+            checkout = retry_on_locked(checkout, using=alias)
+
+        def worker(kind, operation):
+            latencies, errors = [], []
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    operation()
+                except OperationalError as exc:
+                    if not is_locked_error(exc):
+                        raise
+                    errors.append(exc)
+                else:
+                    latencies.append(time.perf_counter() - started)
+                # Stock settings open a connection per request; the production
+                # profile keeps it for as long as it stays usable.
+                if production:
+                    connections[alias].close_if_unusable_or_obsolete()
+                else:
+                    connections[alias].close()
+            connections[alias].close()
+            with lock:
+                results[kind][0].extend(latencies)
+                results[kind][1].extend(errors)
+
+        threads = [threading.Thread(target=worker, args=('write', checkout)) for _ in range(options['writers'])]
+        threads += [threading.Thread(target=worker, args=('read', browse)) for _ in range(options['readers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def report(self, name, results, duration):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{name} profile'))
+        for kind, (latencies, errors) in results.items():
+            ms = [latency * 1000 for latency in latencies]
+            self.stdout.write(
+                f'  {kind:5}  {len(ms) / duration:8.0f} ops/s  '
+                f'p50 {percentile(ms, 50):7.1f} ms  p95 {percentile(ms, 95):7.1f} ms  '
+                f'p99 {percentile(ms, 99):7.1f} ms  mean {statistics.fmean(ms) if ms else 0:7.1f} ms  '
+                f'{len(errors)} locked errors'
+            )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from shop.cart import clear_expired_guest_carts
+
+
+class Command(BaseCommand):
+    help = 'Delete guest carts untouched for CART_GUEST_TIMEOUT seconds.'
+
+    def handle(self, *args, **options):
+        count = clear_expired_guest_carts()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} expired guest carts.'))
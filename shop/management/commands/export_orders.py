@@ -0,0 +1,61 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from shop import exports
+
+
+def parse_moment(value):
+    """A date (midnight, local time) or a datetime."""
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            moment = day and datetime.datetime.combine(day, datetime.time())
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise CommandError(f'Invalid date {value!r}; use YYYY-MM-DD or an ISO 8601 datetime.')
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+class Command(BaseCommand):
+    help = ('Stream orders as CSV or NDJSON to a file or stdout, optionally limited to a '
+            'date range and one user. Rows are read in chunks, so memory use stays flat '
+            'however many orders there are.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv')
+        parser.add_argument('--since', type=parse_moment, help='Orders created at or after this date.')
+        parser.add_argument('--until', type=parse_moment, help='Orders created before this date.')
+        parser.add_argument('--user', help='Only orders of this username.')
+        parser.add_argument('--output', help='File to write (default: stdout).')
+        parser.add_argument('--chunk-size', type=int, help='Rows per database fetch and write.')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            User = get_user_model()
+            try:
+                user = User.objects.get(**{User.USERNAME_FIELD: options['user']})
+            except User.DoesNotExist:
+                raise CommandError(f"No user {options['user']!r}.")
+        # call_command() passes keyword options through without their type.
+        since, until = (
+            parse_moment(value) if isinstance(value, str) else value
+            for value in (options['since'], options['until'])
+        )
+        queryset = exports.filter_orders(since=since, until=until, user=user)
+        chunks = exports.chunks(queryset, options['format'], options['chunk_size'])
+
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', newline='', encoding='utf-8') as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+        self.stderr.write(f"Wrote {options['output']}")
@@ -0,0 +1,43 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from shop import images
+from shop.models import Product
+
+
+def _generate(args):
+    name, force = args
+    return name, len(images.generate_derivatives(name, force=force))
+
+
+class Command(BaseCommand):
+    help = 'Generate resized JPEG and WebP derivatives for every product image.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--force', action='store_true', help='Regenerate existing derivatives.')
+
+    def handle(self, *args, **options):
+        names = sorted(set(
+            Product.objects.exclude(image='').values_list('image', flat=True)
+        ))
+        started = time.perf_counter()
+        jobs = [(name, options['force']) for name in names]
+        generated = 0
+        if options['workers'] > 1:
+            with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+                results = list(pool.map(_generate, jobs, chunksize=16))
+        else:
+            results = [_generate(job) for job in jobs]
+        for name, count in results:
+            if count:
+                generated += 1
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{name}: {count} files')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {len(names)} images ({generated} regenerated) in {elapsed:.1f}s.'
+        ))
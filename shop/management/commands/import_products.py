@@ -0,0 +1,207 @@
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from shop import facets, images, search
+from shop.models import Product
+from shop.storage import product_image_storage
+
+MAX_NAME_LENGTH = Product._meta.get_field('name').max_length
+MAX_PRICE = Decimal('99999999.99')
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImageStore:
+    """Hashes and copies source images into storage, once per distinct file."""
+
+    def __init__(self, image_root, derivatives):
+        self.image_root = Path(image_root)
+        self.derivatives = derivatives
+        self._names = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, path):
+        path = Path(path)
+        if not path.is_absolute():
+            path = self.image_root / path
+        return path.resolve()
+
+    def store(self, path):
+        with self._lock:
+            if path in self._names:
+                return self._names[path]
+        # The product image storage names files by content hash, so identical
+        # files under different paths end up as a single stored copy.
+        with open(path, 'rb') as fh:
+            name = product_image_storage.save(f'products/{path.name}', File(fh))
+        if self.derivatives:
+            # Serialized per image, so threads storing identical files build it once.
+            images.generate_derivatives(name)
+        with self._lock:
+            self._names[path] = name
+        return name
+
+
+class Command(BaseCommand):
+    help = ('Import products from a CSV or JSONL feed with name, price, description and '
+            'image columns. Images are deduplicated by content hash, rows are inserted in '
+            'batches, and an interrupted import resumes from its checkpoint file.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="CSV or JSONL file, or '-' for JSONL on stdin.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'])
+        parser.add_argument('--image-root', default='.', help='Base directory for relative image paths.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=8, help='Threads used to hash and copy images.')
+        parser.add_argument('--checkpoint', help='Checkpoint file (default: <source>.checkpoint).')
+        parser.add_argument('--derivatives', action='store_true', help='Generate image derivatives as images are copied.')
+        parser.add_argument('--max-errors', type=int, default=20, help='Number of invalid rows to print.')
+
+    def handle(self, *args, **options):
+        source = options['source']
+        fmt = options['format'] or ('csv' if source.lower().endswith('.csv') else 'jsonl')
+        if source == '-' and fmt == 'csv':
+            raise CommandError('Reading from stdin is only supported for JSONL.')
+        if source != '-' and not os.path.exists(source):
+            raise CommandError(f'{source} does not exist.')
+
+        checkpoint_path = options['checkpoint'] or (None if source == '-' else f'{source}.checkpoint')
+        resume_from = self.read_checkpoint(checkpoint_path)
+        if resume_from:
+            self.stdout.write(f'Resuming after row {resume_from}.')
+
+        self.images = ImageStore(options['image_root'], options['derivatives'])
+        self.known_names = set(Product.objects.values_list('name', flat=True))
+        self.max_errors = options['max_errors']
+        self.verbosity = options['verbosity']
+        self.stats = {'created': 0, 'duplicates': 0, 'invalid': 0}
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            batch = []
+            row_number = 0
+            for row_number, row in self.read_rows(source, fmt):
+                if row_number <= resume_from:
+                    continue
+                try:
+                    batch.append((row_number, self.validate(row)))
+                except RowError as exc:
+                    self.report_invalid(row_number, exc)
+                if len(batch) >= options['batch_size']:
+                    self.flush(batch, pool, row_number, checkpoint_path, started)
+                    batch = []
+            self.flush(batch, pool, row_number, checkpoint_path, started)
+
+        if self.stats['created']:
+            # bulk_create skips the signals that keep facet counts current.
+            facets.rebuild_buckets()
+        elapsed = time.perf_counter() - started
+        rate = self.stats['created'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {self.stats['created']} products in {elapsed:.1f}s ({rate:.0f} rows/s); "
+            f"{self.stats['duplicates']} duplicates skipped, {self.stats['invalid']} invalid rows."
+        ))
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+    def read_rows(self, source, fmt):
+        fh = sys.stdin if source == '-' else open(source, newline='', encoding='utf-8')
+        try:
+            if fmt == 'csv':
+                yield from enumerate(csv.DictReader(fh), start=1)
+            else:
+                for row_number, line in enumerate(fh, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        row = None
+                    yield row_number, row
+        finally:
+            if fh is not sys.stdin:
+                fh.close()
+
+    def validate(self, row):
+        if not isinstance(row, dict):
+            raise RowError('not a JSON object')
+        name = (row.get('name') or '').strip()
+        if not name:
+            raise RowError('name is required')
+        if len(name) > MAX_NAME_LENGTH:
+            raise RowError(f'name is longer than {MAX_NAME_LENGTH} characters')
+        try:
+            price = Decimal(str(row.get('price', '')).strip())
+        except InvalidOperation:
+            raise RowError(f"invalid price {row.get('price')!r}")
+        if not price.is_finite() or price < 0 or price > MAX_PRICE or price != price.quantize(Decimal('0.01')):
+            raise RowError(f'invalid price {price}')
+        image = (row.get('image') or '').strip()
+        if not image:
+            raise RowError('image is required')
+        image_path = self.images.resolve(image)
+        if not image_path.is_file():
+            raise RowError(f'image {image} not found')
+        return {
+            'name': name,
+            'price': price,
+            'description': (row.get('description') or '').strip(),
+            'image_path': image_path,
+        }
+
+    def report_invalid(self, row_number, error):
+        self.stats['invalid'] += 1
+        if self.stats['invalid'] <= self.max_errors:
+            self.stderr.write(f'Row {row_number}: {error}')
+
+    def flush(self, batch, pool, row_number, checkpoint_path, started):
+        rows = []
+        for _, row in batch:
+            if row['name'] in self.known_names:
+                self.stats['duplicates'] += 1
+                continue
+            self.known_names.add(row['name'])
+            rows.append(row)
+
+        image_names = list(pool.map(self.images.store, [row['image_path'] for row in rows]))
+        products = [
+            Product(name=row['name'], price=row['price'], description=row['description'], image=image_name)
+            for row, image_name in zip(rows, image_names)
+        ]
+        with transaction.atomic():
+            created = Product.objects.bulk_create(products)
+            search.index_products(created)
+        self.stats['created'] += len(created)
+        self.write_checkpoint(checkpoint_path, row_number)
+
+        elapsed = time.perf_counter() - started
+        rate = self.stats['created'] / elapsed if elapsed else 0
+        if self.verbosity > 0 and created:
+            self.stdout.write(f"Row {row_number}: {self.stats['created']} created, {rate:.0f} rows/s")
+
+    def read_checkpoint(self, path):
+        if not path or not os.path.exists(path):
+            return 0
+        with open(path) as fh:
+            return json.load(fh).get('row', 0)
+
+    def write_checkpoint(self, path, row_number):
+        if not path:
+            return
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as fh:
+            json.dump({'row': row_number}, fh)
+        os.replace(tmp, path)
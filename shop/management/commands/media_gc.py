@@ -0,0 +1,92 @@
+import os
+import re
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from shop import catalog, images
+from shop.models import Product
+from shop.storage import product_image_storage
+
+HASHED_NAME_RE = re.compile(r'^products/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+class Command(BaseCommand):
+    help = ('Delete product images and derivatives under MEDIA_ROOT that no product '
+            'references. With --consolidate, first move legacy uploads into the '
+            'content-addressed layout so duplicate copies become garbage.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be deleted.')
+        parser.add_argument('--consolidate', action='store_true',
+                            help='Re-store legacy image names under their content hash first.')
+        parser.add_argument('--grace-seconds', type=int, default=3600,
+                            help='Keep unreferenced files younger than this (uploads still in flight).')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        if options['consolidate']:
+            self.consolidate(dry_run)
+
+        referenced = set(Product.objects.exclude(image='').values_list('image', flat=True).distinct())
+        keep = set(referenced)
+        for name in referenced:
+            keep.update(images.derivative_names(name))
+
+        cutoff = time.time() - options['grace_seconds']
+        media_root = os.fspath(settings.MEDIA_ROOT)
+        removed = kept = freed = 0
+        for top in ('products', 'derivatives'):
+            for dirpath, dirnames, filenames in os.walk(os.path.join(media_root, top)):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    name = os.path.relpath(path, media_root).replace(os.sep, '/')
+                    if name in keep:
+                        kept += 1
+                        continue
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    if stat.st_mtime > cutoff:
+                        continue
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'{"Would remove" if dry_run else "Removing"} {name}')
+                    if dry_run:
+                        pass
+                    elif HASHED_NAME_RE.match(name):
+                        # Stored images can be reused by an upload at any moment;
+                        # release_image re-checks safely and takes the derivatives too.
+                        if not images.release_image(name, grace=options['grace_seconds']):
+                            continue
+                    else:
+                        os.remove(path)
+                    removed += 1
+                    freed += stat.st_size
+
+        verb = 'Would free' if dry_run else 'Freed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {freed / 1024 / 1024:.1f} MiB: {removed} unreferenced files, {kept} files in use.'
+        ))
+
+    def consolidate(self, dry_run):
+        legacy = (
+            Product.objects.exclude(image='').values_list('image', flat=True).distinct()
+        )
+        moved = 0
+        for name in list(legacy):
+            if HASHED_NAME_RE.match(name) or not product_image_storage.exists(name):
+                continue
+            moved += 1
+            if dry_run:
+                continue
+            with product_image_storage.open(name, 'rb') as fh:
+                new_name = product_image_storage.save(name, fh)
+            with transaction.atomic():
+                Product.objects.filter(image=name).update(image=new_name)
+            images.generate_derivatives(new_name)
+        if moved and not dry_run:
+            catalog.invalidate()
+        self.stdout.write(f'{"Would consolidate" if dry_run else "Consolidated"} {moved} legacy image names.')
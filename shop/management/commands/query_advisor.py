@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from shop import query_advisor
+
+
+class Command(BaseCommand):
+    help = ("Replay the queries behind the shop's pages, EXPLAIN them and flag "
+            'full scans and temporary B-trees, with index suggestions.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Show queries with clean plans too.')
+        parser.add_argument('--sql-width', type=int, default=160, help='Truncate SQL to this many characters.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('query_advisor reads SQLite query plans; the default database is '
+                               f'{connection.vendor}.')
+        findings = query_advisor.run()
+        width = options['sql_width']
+        scenario = None
+        flagged = 0
+        suggestions = {}
+        for finding in findings:
+            if finding.problems:
+                flagged += 1
+            elif not options['all']:
+                continue
+            if finding.scenario != scenario:
+                scenario = finding.scenario
+                self.stdout.write(self.style.MIGRATE_HEADING(scenario))
+            self.stdout.write(f'  {finding.sql[:width]}')
+            for line in finding.plan:
+                self.stdout.write(f'    plan: {line}')
+            for problem in finding.problems:
+                self.stdout.write(self.style.WARNING(f'    ! {problem}'))
+            for label, fields in finding.suggestions:
+                suggestions.setdefault((label, tuple(fields)), []).append(finding.scenario)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{flagged} of {len(findings)} queries flagged, {len(suggestions)} index suggestions'
+        ))
+        for (label, fields), scenarios in suggestions.items():
+            self.stdout.write(f'  {label}: models.Index(fields={list(fields)!r})  '
+                              f'# {", ".join(dict.fromkeys(scenarios))}')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from shop import facets
+
+
+class Command(BaseCommand):
+    help = 'Recount the price facet buckets and recompute product popularity from order items.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--skip-popularity', action='store_true',
+                            help='Only recount the price buckets.')
+
+    def handle(self, *args, **options):
+        buckets = facets.rebuild_buckets()
+        for bucket in buckets:
+            self.stdout.write(f'{bucket}: {bucket.product_count} products')
+        if not options['skip_popularity']:
+            count = facets.rebuild_popularity(batch_size=options['batch_size'])
+            self.stdout.write(f'Recomputed units sold for {count} products.')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(buckets)} price buckets.'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from shop import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Recount the frequently-bought-together product pairs from every order.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Orders per transaction (default: RECOMMENDATIONS_REBUILD_CHUNK_SIZE).')
+
+    def handle(self, *args, **options):
+        def progress(orders, last_id):
+            self.stdout.write(f'{orders} orders counted (through order {last_id})')
+
+        verbose = options['verbosity'] > 1
+        count = recommendations.rebuild(chunk_size=options['chunk_size'], progress=progress if verbose else None)
+        self.stdout.write(self.style.SUCCESS(f'Counted product pairs in {count} orders.'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shop import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the FTS5 product search index from the product table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if not search.fts_available():
+            raise CommandError('Full-text search needs the SQLite backend with FTS5.')
+        count = search.rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} products.'))
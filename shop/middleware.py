@@ -0,0 +1,113 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from . import profiling
+
+
+class CartMiddleware:
+    """Write back buffered guest cart changes once the view has run."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        for store in self.stores(request):
+            store.flush(response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        for store in self.stores(request):
+            await sync_to_async(store.flush)(response)
+        return response
+
+    def stores(self, request):
+        for attr in ('_cart_store', '_guest_cart'):
+            store = getattr(request, attr, None)
+            if store is not None:
+                yield store
+
+
+class ProfilingMiddleware:
+    """Time SQL, templates, sessions and the view for every request.
+
+    The totals go out in a ``Server-Timing`` header and a sample of requests
+    is written to the trace log (see ``shop.profiling``). Keep this first in
+    ``MIDDLEWARE`` so the total covers every other middleware. "view" runs
+    from URL resolution until the response leaves the inner middleware,
+    minus the session save. Under ASGI it runs natively async, so it does
+    not push the rest of the stack into a worker thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+            # A sync process_view would be adapted into a thread hop per request.
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        profile, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiling.current.reset(token)
+        if self.finish(request, response, profile):
+            profiling.write_trace(profile.trace(request, response))
+        return response
+
+    async def __acall__(self, request):
+        profile, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiling.current.reset(token)
+        if self.finish(request, response, profile):
+            await sync_to_async(profiling.write_trace)(profile.trace(request, response))
+        return response
+
+    def start(self):
+        # Queries are timed by the wrapper shop.signals installs on every
+        # connection; the profile follows the request into worker threads.
+        profile = profiling.Profile(sampled=random.random() < settings.PROFILING_SAMPLE_RATE)
+        return profile, profiling.current.set(profile)
+
+    def finish(self, request, response, profile):
+        """Fill in the totals and the header; returns whether to write a trace."""
+        now = time.perf_counter()
+        profile.total = now - profile.started
+        if profile.view_started is not None:
+            profile.view = now - profile.view_started - profile.session_save
+        if settings.PROFILING_SERVER_TIMING:
+            response['Server-Timing'] = profile.server_timing()
+        return profile.sampled
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.start_view()
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self.start_view()
+
+    @staticmethod
+    def start_view():
+        profile = profiling.current.get()
+        if profile is not None:
+            profile.view_started = time.perf_counter()
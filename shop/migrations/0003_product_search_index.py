@@ -0,0 +1,31 @@
+from django.db import migrations
+
+from shop import search
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    search.create_index(schema_editor)
+    Product = apps.get_model('shop', 'Product')
+    schema_editor.execute(
+        f'INSERT INTO {search.FTS_TABLE}(rowid, name, description) '
+        f'SELECT id, name, description FROM {Product._meta.db_table}'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    search.drop_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0002_wishlist'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0003_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='cart_data',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_name', models.CharField(max_length=255)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('quantity', models.PositiveIntegerField()),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='shop.order')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_items', to='shop.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'quantity', 'unit_price'], name='orderitem_product_sales_idx'), models.Index(fields=['order', 'product'], name='orderitem_order_product_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+from decimal import Decimal
+
+from django.db import migrations
+
+
+def backfill_order_items(apps, schema_editor):
+    Order = apps.get_model('shop', 'Order')
+    OrderItem = apps.get_model('shop', 'OrderItem')
+    Product = apps.get_model('shop', 'Product')
+
+    batch = []
+    orders = Order.objects.filter(items__isnull=True).order_by('id')
+    for order in orders.iterator(chunk_size=500):
+        lines = {}
+        for product_id, quantity in (order.cart_data or {}).items():
+            try:
+                lines[int(product_id)] = int(quantity)
+            except (TypeError, ValueError):
+                continue
+        products = Product.objects.in_bulk(list(lines))
+        for product_id, quantity in lines.items():
+            product = products.get(product_id)
+            # Historical prices were never stored; a single-line order can be
+            # recovered exactly from its total, otherwise use today's price.
+            if len(lines) == 1 and quantity:
+                unit_price = (order.total_price / quantity).quantize(Decimal('0.01'))
+            elif product is not None:
+                unit_price = product.price
+            else:
+                unit_price = Decimal('0.00')
+            batch.append(OrderItem(
+                order_id=order.id,
+                product=product,
+                product_name=product.name if product else f'Deleted product #{product_id}',
+                unit_price=unit_price,
+                quantity=quantity,
+            ))
+        if len(batch) >= 1000:
+            OrderItem.objects.bulk_create(batch)
+            batch = []
+    OrderItem.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0004_orderitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_order_items, migrations.RunPython.noop),
+    ]
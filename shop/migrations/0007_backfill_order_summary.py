@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def backfill_order_summary(apps, schema_editor):
+    Order = apps.get_model('shop', 'Order')
+    OrderItem = apps.get_model('shop', 'OrderItem')
+    max_length = Order._meta.get_field('items_summary').max_length
+
+    batch = []
+    for order in Order.objects.order_by('id').iterator(chunk_size=500):
+        items = list(OrderItem.objects.filter(order_id=order.id).order_by('id'))
+        order.item_count = sum(item.quantity for item in items)
+        summary = ', '.join(f"{item.quantity} x {item.product_name}" for item in items)
+        if len(summary) > max_length:
+            summary = summary[:max_length - 3] + '...'
+        order.items_summary = summary
+        batch.append(order)
+        if len(batch) >= 500:
+            Order.objects.bulk_update(batch, ['item_count', 'items_summary'])
+            batch = []
+    Order.objects.bulk_update(batch, ['item_count', 'items_summary'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0006_order_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_order_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:22
+
+from django.db import migrations, models
+import shop.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_backfill_order_summary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=models.ImageField(db_index=True, storage=shop.storage.get_product_image_storage, upload_to='products/'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0012_product_price_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('low', models.DecimalField(decimal_places=2, max_digits=10, unique=True)),
+                ('high', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('product_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='price_bucket',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='units_sold',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['units_sold', 'id'], name='product_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price_bucket', 'id'], name='product_bucket_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price_bucket', 'units_sold', 'id'], name='product_bucket_popularity_idx'),
+        ),
+    ]
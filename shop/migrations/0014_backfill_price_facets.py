@@ -0,0 +1,49 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def backfill_price_facets(apps, schema_editor):
+    Product = apps.get_model('shop', 'Product')
+    OrderItem = apps.get_model('shop', 'OrderItem')
+    PriceBucket = apps.get_model('shop', 'PriceBucket')
+
+    edges = [Decimal(str(edge)) for edge in settings.SHOP_PRICE_BUCKETS]
+    ranges = list(zip(edges, edges[1:] + [None]))
+    for low, high in ranges:
+        products = Product.objects.filter(price__gte=low)
+        if high is not None:
+            products = products.filter(price__lt=high)
+        products.update(price_bucket=low)
+    counts = dict(
+        Product.objects.exclude(price_bucket=None).order_by()
+        .values_list('price_bucket').annotate(count=Count('id'))
+    )
+    PriceBucket.objects.bulk_create([
+        PriceBucket(low=low, high=high, product_count=counts.get(low, 0)) for low, high in ranges
+    ])
+
+    totals = (
+        OrderItem.objects.filter(product__isnull=False).order_by()
+        .values('product_id').annotate(units=Sum('quantity'))
+    )
+    batch = []
+    for row in totals.iterator(chunk_size=1000):
+        batch.append(Product(id=row['product_id'], units_sold=row['units']))
+        if len(batch) >= 1000:
+            Product.objects.bulk_update(batch, ['units_sold'])
+            batch = []
+    Product.objects.bulk_update(batch, ['units_sold'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0013_price_facets'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_price_facets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0014_backfill_price_facets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductPair',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shop.product')),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shop.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', '-count', 'other'], name='productpair_top_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='productpair',
+            constraint=models.UniqueConstraint(fields=('product', 'other'), name='unique_product_pair'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0015_product_pairs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GuestCart',
+            fields=[
+                ('cart_id', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('items', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+    ]
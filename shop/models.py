@@ -2,29 +2,147 @@ from django.db import models
 from django.conf import settings
 from django.contrib.auth import get_user_model
 
+from .storage import get_product_image_storage
+
 # Create your models here.
 
 class Product(models.Model):
     name = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    image = models.ImageField(upload_to='products/')
+    image = models.ImageField(upload_to='products/', storage=get_product_image_storage, db_index=True)
     description = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    units_sold = models.PositiveIntegerField(default=0)
+    # Lower bound of the price facet the product falls in; see shop.facets.
+    price_bucket = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Price ranges and pages ordered by price walk this instead of sorting the table.
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            # Pages ordered by popularity, best sellers first.
+            models.Index(fields=['units_sold', 'id'], name='product_popularity_idx'),
+            # One price facet in catalog or newest order, and by popularity.
+            models.Index(fields=['price_bucket', 'id'], name='product_bucket_idx'),
+            models.Index(fields=['price_bucket', 'units_sold', 'id'], name='product_bucket_popularity_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+class ProductPair(models.Model):
+    """How many orders contained both ``product`` and ``other``; kept in both directions."""
+    # The unique constraint leads with product, so it needs no index of its own.
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', db_index=False)
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'other'], name='unique_product_pair'),
+        ]
+        indexes = [
+            # A product's top pairs are one seek, best first.
+            models.Index(fields=['product', '-count', 'other'], name='productpair_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} + {self.other_id}: {self.count}"
+
+class PriceBucket(models.Model):
+    """How many products cost at least ``low`` and less than ``high``."""
+    low = models.DecimalField(max_digits=10, decimal_places=2, unique=True)
+    high = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    product_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.low} to {self.high}" if self.high is not None else f"{self.low} and up"
+
 class Order(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     name = models.CharField(max_length=255)
     email = models.EmailField()
     address = models.TextField()
-    cart_data = models.JSONField()
+    cart_data = models.JSONField(default=dict, blank=True)
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
+    item_count = models.PositiveIntegerField(default=0)
+    items_summary = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        indexes = [
+            # Order history pages seek on user and walk newest first.
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+            # The admin date hierarchy probes date ranges across all users.
+            models.Index(fields=['created_at'], name='order_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.pk} by {self.name}"
 
+    def summarize(self, items):
+        """Store the item count and a one-line summary of ``items`` on the order."""
+        self.item_count = sum(item.quantity for item in items)
+        summary = ', '.join(f"{item.quantity} x {item.product_name}" for item in items)
+        max_length = self._meta.get_field('items_summary').max_length
+        if len(summary) > max_length:
+            summary = summary[:max_length - 3] + '...'
+        self.items_summary = summary
+
+class OrderItem(models.Model):
+    # Both lead a composite index below, which serves their lookups too.
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items', db_index=False)
+    product = models.ForeignKey(
+        Product, on_delete=models.SET_NULL, null=True, blank=True, related_name='order_items', db_index=False,
+    )
+    product_name = models.CharField(max_length=255)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            # Covers per-product sales totals without touching the table.
+            models.Index(fields=['product', 'quantity', 'unit_price'], name='orderitem_product_sales_idx'),
+            # Per-user aggregates join orders on user and then items on order.
+            models.Index(fields=['order', 'product'], name='orderitem_order_product_idx'),
+        ]
+
+    @property
+    def subtotal(self):
+        return self.unit_price * self.quantity
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_name}"
+
+class Cart(models.Model):
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cart')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Cart for {self.user}"
+
+class CartLine(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='lines')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    quantity = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id}"
+
+class GuestCart(models.Model):
+    """An anonymous visitor's cart, keyed by the id in their cart cookie."""
+    cart_id = models.CharField(max_length=32, primary_key=True)
+    items = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"Guest cart {self.cart_id}"
+
 class Wishlist(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     products = models.ManyToManyField(Product, related_name='wishlists')
@@ -0,0 +1,81 @@
+"""Full-page cache for anonymous catalog pages.
+
+Cached pages are rendered without anything tied to a session: the CSRF token
+is a placeholder and the cart badge and flash messages are left empty. The
+browser fills them in from ``session_fragment`` after the page loads, so a
+cache hit never touches the ORM or the template engine.
+"""
+import asyncio
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import catalog
+from .auth import aget_user
+
+CSRF_PLACEHOLDER = 'page-cache-csrf-token'
+
+
+def _cache_key(request, version):
+    digest = hashlib.sha1(request.get_full_path().encode()).hexdigest()
+    return f'page:{version}:{request.method}:{digest}'
+
+
+def _cacheable(response):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    if hasattr(response, 'render'):
+        response.render()
+    return True
+
+
+def cache_anonymous_page(view):
+    if asyncio.iscoroutinefunction(view):
+        return _acache_anonymous_page(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+
+        cache = caches[settings.PAGE_CACHE_ALIAS]
+        key = _cache_key(request, catalog.get_version())
+        response = cache.get(key)
+        if response is not None:
+            response['X-Page-Cache'] = 'hit'
+            return response
+
+        request.page_cached = True
+        response = view(request, *args, **kwargs)
+        if _cacheable(response):
+            cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+        response['X-Page-Cache'] = 'miss'
+        return response
+
+    return wrapper
+
+
+def _acache_anonymous_page(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await aget_user(request)
+        if request.method not in ('GET', 'HEAD') or user.is_authenticated:
+            return await view(request, *args, **kwargs)
+
+        cache = caches[settings.PAGE_CACHE_ALIAS]
+        key = _cache_key(request, await catalog.aget_version())
+        response = await cache.aget(key)
+        if response is not None:
+            response['X-Page-Cache'] = 'hit'
+            return response
+
+        request.page_cached = True
+        response = await view(request, *args, **kwargs)
+        if _cacheable(response):
+            await cache.aset(key, response, settings.PAGE_CACHE_TIMEOUT)
+        response['X-Page-Cache'] = 'miss'
+        return response
+
+    return wrapper
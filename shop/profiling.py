@@ -0,0 +1,155 @@
+"""Per-request timings for the profiling middleware.
+
+The middleware starts a ``Profile`` for every request and keeps it in a
+context variable, which follows the request into ``sync_to_async`` and
+``async_to_sync`` calls. Time is attributed to it by:
+
+* a database execute wrapper that ``shop.signals`` installs on every
+  connection as it opens (SQL),
+* ``shop.profiling.DjangoTemplates``, the template backend (rendering),
+* ``shop.sessions.SessionStore``, the session engine (session load/save).
+
+A sample of requests (``PROFILING_SAMPLE_RATE``) is appended to a rotating
+JSONL trace file, together with their slowest queries; ``manage.py
+trace_summary`` reads it back. Rotation is per process, so give each worker
+process its own ``PROFILING_TRACE_FILE`` if several share a host.
+"""
+import contextvars
+import heapq
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+current = contextvars.ContextVar('shop_profile', default=None)
+
+trace_logger = logging.getLogger('shop.profiling.trace')
+trace_logger.propagate = False
+
+
+class Profile:
+    def __init__(self, sampled=False):
+        self.started = time.perf_counter()
+        self.sampled = sampled
+        self.queries = 0
+        self.db = 0.0
+        self.template = 0.0
+        self.session_load = 0.0
+        self.session_save = 0.0
+        self.view_started = None
+        self.view = 0.0
+        self.total = 0.0
+        self.rendering = False
+        self.slow_queries = []
+
+    def add_query(self, sql, elapsed):
+        self.queries += 1
+        self.db += elapsed
+        if self.sampled:
+            entry = (elapsed, self.queries, sql)
+            if len(self.slow_queries) < settings.PROFILING_SLOW_QUERIES:
+                heapq.heappush(self.slow_queries, entry)
+            else:
+                heapq.heappushpop(self.slow_queries, entry)
+
+    def server_timing(self):
+        metrics = [
+            ('db', self.db, f'{self.queries} queries'),
+            ('tpl', self.template, 'templates'),
+            ('session', self.session_load + self.session_save, 'session load/save'),
+            ('view', self.view, 'view'),
+            ('total', self.total, 'total'),
+        ]
+        return ', '.join(f'{name};dur={seconds * 1000:.1f};desc="{desc}"' for name, seconds, desc in metrics)
+
+    def trace(self, request, response):
+        match = getattr(request, 'resolver_match', None)
+        return {
+            'ts': round(time.time(), 3),
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else '',
+            'status': response.status_code,
+            'total_ms': round(self.total * 1000, 2),
+            'view_ms': round(self.view * 1000, 2),
+            'db_ms': round(self.db * 1000, 2),
+            'queries': self.queries,
+            'template_ms': round(self.template * 1000, 2),
+            'session_ms': round((self.session_load + self.session_save) * 1000, 2),
+            'slow_queries': [
+                {'sql': sql, 'ms': round(elapsed * 1000, 2)}
+                for elapsed, _, sql in sorted(self.slow_queries, reverse=True)
+            ],
+        }
+
+
+def query_timer(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile = current.get()
+        if profile is not None:
+            profile.add_query(sql, time.perf_counter() - started)
+
+
+@contextmanager
+def measure(attr):
+    """Add the time spent in the block to ``attr`` of the current profile."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile = current.get()
+        if profile is not None:
+            setattr(profile, attr, getattr(profile, attr) + time.perf_counter() - started)
+
+
+def write_trace(record):
+    path = os.path.abspath(settings.PROFILING_TRACE_FILE)
+    if not trace_logger.handlers or trace_logger.handlers[0].baseFilename != path:
+        for handler in list(trace_logger.handlers):
+            trace_logger.removeHandler(handler)
+            handler.close()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = RotatingFileHandler(
+            path, maxBytes=settings.PROFILING_TRACE_MAX_BYTES,
+            backupCount=settings.PROFILING_TRACE_BACKUPS, encoding='utf-8',
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        trace_logger.addHandler(handler)
+        trace_logger.setLevel(logging.INFO)
+    trace_logger.info(json.dumps(record, separators=(',', ':')))
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        profile = current.get()
+        if profile is None or profile.rendering:
+            return super().render(context, request)
+        # Only the outermost render is timed; includes run inside it.
+        profile.rendering = True
+        try:
+            with measure('template'):
+                return super().render(context, request)
+        finally:
+            profile.rendering = False
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """The stock Django template backend with render times recorded."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
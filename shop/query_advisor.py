@@ -0,0 +1,257 @@
+"""Replay the queries behind the shop's pages and read their SQLite plans.
+
+Each scenario runs the same data access a view does (bypassing the catalog
+cache, which would hide the queries) inside a transaction that is rolled
+back. Every SELECT it issues is passed through ``EXPLAIN QUERY PLAN``; full
+table scans and temporary B-trees for sorting, grouping or DISTINCT are
+flagged, and an index is suggested from the columns the query filters and
+sorts on, unless an existing index already starts with them.
+"""
+import re
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import api, exports, facets, recommendations, wishlists
+from .cart import price_cart
+from .models import Order, PriceBucket, Product
+from .pagination import paginate_keyset
+from .search import search_products
+
+SCAN_RE = re.compile(r'^SCAN (\w+)(?: AS \w+)?(?: USING (COVERING )?INDEX (\w+))?')
+TEMP_BTREE_RE = re.compile(r'USE TEMP B-TREE FOR (.+)$')
+COLUMN_RE = r'"(\w+)"\."(\w+)"'
+EQUALITY_RE = re.compile(COLUMN_RE + r' (?:= |IN \(|IS NULL)')
+RANGE_RE = re.compile(COLUMN_RE + r' (?:<|>|<=|>=) ')
+WHERE_RE = re.compile(r' WHERE (.+?)(?: GROUP BY | ORDER BY | LIMIT |$)')
+ORDER_BY_RE = re.compile(r' ORDER BY (.+?)(?: LIMIT | OFFSET |$)')
+LIKE_RE = re.compile(COLUMN_RE + r' LIKE ')
+FROM_RE = re.compile(r' FROM "(\w+)"')
+
+
+@dataclass
+class Sample:
+    """Real ids and words from the database for the scenarios to use."""
+    user: object = None
+    product: object = None
+    order: object = None
+    word: str = ''
+
+    @classmethod
+    def pick(cls):
+        order = Order.objects.filter(user__isnull=False).order_by('-id').first()
+        product = Product.objects.order_by('-id').first()
+        user = order.user if order else get_user_model().objects.order_by('-id').first()
+        words = re.findall(r'\w{3,}', product.name) if product else []
+        return cls(user=user, product=product, order=order, word=words[0] if words else '')
+
+
+def product_list(sample):
+    page = paginate_keyset(Product.objects.all(), None, settings.SHOP_PRODUCTS_PER_PAGE)
+    if page.next_cursor:
+        paginate_keyset(Product.objects.all(), page.next_cursor, settings.SHOP_PRODUCTS_PER_PAGE)
+    Product.objects.aggregate(count=Count('id'), updated_at=Max('updated_at'))
+    if sample.user:
+        wishlists.wishlist_product_ids(sample.user)
+
+
+def product_facets(sample):
+    list(PriceBucket.objects.values_list('low', 'product_count'))
+    ranges = facets.ranges()
+    bucket = ranges[len(ranges) // 2] if ranges else None
+    for sort in facets.SORTS:
+        ordering = facets.ordering(sort)
+        products = Product.objects.filter(**facets.price_filters(bucket, ordering))
+        page = paginate_keyset(products, None, settings.SHOP_PRODUCTS_PER_PAGE, ordering)
+        if page.next_cursor:
+            paginate_keyset(products, page.next_cursor, settings.SHOP_PRODUCTS_PER_PAGE, ordering)
+
+
+def product_search(sample):
+    if sample.word:
+        search_products(sample.word, None, settings.SHOP_PRODUCTS_PER_PAGE)
+
+
+def product_detail(sample):
+    if sample.product:
+        Product.objects.filter(id=sample.product.id).first()
+        list(recommendations.top_pairs(sample.product.id))
+
+
+def cart(sample):
+    if sample.product:
+        price_cart({str(sample.product.id): 1})
+
+
+def wishlist(sample):
+    if sample.user:
+        wishlists.wishlist_products(sample.user)
+
+
+def order_history(sample):
+    if not sample.user:
+        return
+    orders = Order.objects.filter(user=sample.user)
+    page = paginate_keyset(orders, None, settings.ORDER_HISTORY_PER_PAGE, ordering='-created_at')
+    if page.next_cursor:
+        paginate_keyset(orders, page.next_cursor, settings.ORDER_HISTORY_PER_PAGE, ordering='-created_at')
+
+
+def thank_you(sample):
+    if sample.order:
+        Order.objects.filter(id=sample.order.id).first()
+
+
+def api_products(sample):
+    products = Product.objects.values(*api.columns_for(api.DEFAULT_FIELDS))
+    page = paginate_keyset(products, None, settings.API_PAGE_SIZE)
+    if page.next_cursor:
+        paginate_keyset(products, page.next_cursor, settings.API_PAGE_SIZE)
+
+
+def order_export(sample):
+    if sample.user:
+        for _ in exports.rows(exports.filter_orders(user=sample.user)):
+            pass
+    for _ in exports.rows(exports.filter_orders(since=timezone.now() - timedelta(days=7))):
+        pass
+
+
+def admin_orders(sample):
+    if sample.user:
+        list(Order.objects.filter(user=sample.user).select_related('user').order_by('-created_at', '-id')[:100])
+
+
+def admin_products(sample):
+    ranges = facets.ranges()
+    bucket = ranges[len(ranges) // 2] if ranges else None
+    list(Product.objects.filter(**facets.price_filters(bucket)).order_by('-pk')[:100])
+
+
+SCENARIOS = [
+    ('shop.views.product_list', product_list),
+    ('shop.views.product_list?sort=&price=', product_facets),
+    ('shop.views.product_list?q=', product_search),
+    ('shop.views.product_detail', product_detail),
+    ('shop.views.cart_view', cart),
+    ('shop.views.wishlist_view', wishlist),
+    ('shop.views.thank_you', thank_you),
+    ('accounts.views.order_history', order_history),
+    ('shop.api.products', api_products),
+    ('manage.py export_orders', order_export),
+    ('admin: orders by customer', admin_orders),
+    ('admin: products by price range', admin_products),
+]
+
+
+@dataclass
+class Finding:
+    scenario: str
+    sql: str
+    plan: list
+    problems: list = field(default_factory=list)
+    suggestions: list = field(default_factory=list)
+
+
+def capture(scenario, sample):
+    """SQL of every SELECT the scenario runs; its writes are rolled back."""
+    with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+        scenario(sample)
+        transaction.set_rollback(True)
+    return [query['sql'] for query in queries if query['sql'].lstrip().upper().startswith('SELECT')]
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def existing_indexes(table):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+        primary_key = connection.introspection.get_primary_key_column(cursor, table)
+    indexes = []
+    for info in constraints.values():
+        if info['index'] or info['primary_key']:
+            # SQLite stores the rowid at the end of every index entry.
+            columns = info['columns']
+            indexes.append(columns if primary_key in columns else columns + [primary_key])
+    return indexes
+
+
+def suggest_index(sql, table):
+    """Columns for an index on ``table``: equality filters first, then ranges and sort keys."""
+    columns = []
+    where = WHERE_RE.search(sql)
+    for pattern in (EQUALITY_RE, RANGE_RE):
+        columns += [column for name, column in pattern.findall(where.group(1) if where else '') if name == table]
+    order_by = ORDER_BY_RE.search(sql)
+    if order_by:
+        columns += [column for name, column in re.findall(COLUMN_RE, order_by.group(1)) if name == table]
+    columns = list(dict.fromkeys(columns))
+    if not columns:
+        return None
+    for index in existing_indexes(table):
+        if index[:len(columns)] == columns:
+            return None
+    return columns
+
+
+def model_fields(table, columns):
+    """``(model label, field names)`` for ``columns`` of ``table``, as an index would name them."""
+    for model in apps.get_models(include_auto_created=True):
+        if model._meta.db_table == table:
+            by_column = {f.column: f.name for f in model._meta.concrete_fields}
+            return model._meta.label, [by_column.get(column, column) for column in columns]
+    return table, columns
+
+
+def analyse(sql, scenario_name=''):
+    plan = explain(sql)
+    finding = Finding(scenario_name, sql, plan)
+    # A scan in ORDER BY order stops after LIMIT rows; unfiltered, that is all it reads.
+    ordered = ' LIMIT ' in sql and not any('TEMP B-TREE' in line for line in plan)
+    if ordered and ' WHERE ' not in sql:
+        return finding
+    for line in plan:
+        scan = SCAN_RE.match(line)
+        if scan and 'VIRTUAL TABLE' not in line:
+            table, covering, index = scan.groups()
+            if ordered:
+                finding.problems.append(f'ordered scan of {table} until LIMIT rows match the filter')
+            elif index:
+                finding.problems.append(f'full {"covering " if covering else ""}index scan of {table} via {index}')
+            else:
+                finding.problems.append(f'full table scan of {table}')
+            if any(name == table for name, _ in LIKE_RE.findall(sql)):
+                finding.problems.append(f'LIKE with a leading wildcard on {table} cannot use an index')
+                continue
+            columns = suggest_index(sql, table)
+            if columns:
+                finding.suggestions.append(model_fields(table, columns))
+        temp = TEMP_BTREE_RE.search(line)
+        if temp:
+            finding.problems.append(f'temporary B-tree for {temp.group(1).lower()}')
+    if any('TEMP B-TREE' in line for line in plan) and not finding.suggestions:
+        table = FROM_RE.search(sql)
+        columns = suggest_index(sql, table.group(1)) if table else None
+        if columns:
+            finding.suggestions.append(model_fields(table.group(1), columns))
+    return finding
+
+
+def run(sample=None):
+    sample = sample or Sample.pick()
+    findings = []
+    for name, scenario in SCENARIOS:
+        for sql in capture(scenario, sample):
+            findings.append(analyse(sql, name))
+    return findings
@@ -0,0 +1,114 @@
+"""Frequently bought together: co-purchase counts from order history.
+
+``ProductPair`` holds, for every two products that have been in the same
+order, how many orders contained both. Each pair is stored in both
+directions, so a product's list is one seek on ``(product, -count, other)``.
+Placing an order adds its pairs in one statement; ``manage.py
+rebuild_recommendations`` recounts them from every order, a chunk of orders
+at a time, and swaps the new counts in at the end. The detail page
+reads the top ``RECOMMENDATIONS_PER_PRODUCT`` through the catalog cache and
+never counts anything at request time.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+
+from . import catalog
+from .models import Order, OrderItem, ProductPair
+
+
+STAGING_TABLE = 'productpair_rebuild'
+
+
+def _count_orders(table, first_id, last_id=None):
+    """Add the pairs of orders ``first_id..last_id`` to ``table`` in one statement."""
+    items = OrderItem._meta.db_table
+    if last_id is None:
+        where, params = 'a.order_id >= %s', [first_id]
+    else:
+        where, params = 'a.order_id BETWEEN %s AND %s', [first_id, last_id]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (product_id, other_id, count) '
+            f'SELECT a.product_id, b.product_id, COUNT(DISTINCT a.order_id) '
+            f'FROM {items} a INNER JOIN {items} b ON a.order_id = b.order_id AND a.product_id <> b.product_id '
+            f'WHERE {where} '
+            f'GROUP BY a.product_id, b.product_id '
+            f'ON CONFLICT (product_id, other_id) DO UPDATE SET count = {table}.count + excluded.count',
+            params,
+        )
+
+
+def record_order(items):
+    """Count the pairs in the items of one newly placed order, in one statement."""
+    if len({item.product_id for item in items if item.product_id}) > 1:
+        order_id = items[0].order_id
+        _count_orders(ProductPair._meta.db_table, order_id, order_id)
+
+
+def rebuild(chunk_size=None, progress=None):
+    """Recount every pair from order items; returns how many orders were read.
+
+    Counts are built in a temporary table, ``chunk_size`` orders at a time,
+    while product pages keep reading the current pairs. One transaction
+    then replaces the pairs with the new counts plus the orders placed
+    since the rebuild started. If the rebuild fails, the pairs are untouched.
+    """
+    chunk_size = chunk_size or settings.RECOMMENDATIONS_REBUILD_CHUNK_SIZE
+    table = ProductPair._meta.db_table
+    last_id = Order.objects.aggregate(last=Max('id'))['last'] or 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {STAGING_TABLE}')
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {STAGING_TABLE} (product_id integer NOT NULL, other_id integer NOT NULL, '
+            f'count integer NOT NULL, PRIMARY KEY (product_id, other_id))'
+        )
+    try:
+        orders = 0
+        after = 0
+        while after < last_id:
+            chunk = Order.objects.filter(id__gt=after, id__lte=last_id).order_by('id')
+            ids = list(chunk.values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                _count_orders(STAGING_TABLE, ids[0], ids[-1])
+            orders += len(ids)
+            after = ids[-1]
+            if progress:
+                progress(orders, after)
+        with transaction.atomic(), connection.cursor() as cursor:
+            # record_order counted the newer orders into the old rows; recount them here.
+            ProductPair.objects.all().delete()
+            cursor.execute(
+                f'INSERT INTO {table} (product_id, other_id, count) '
+                f'SELECT product_id, other_id, count FROM {STAGING_TABLE}'
+            )
+            _count_orders(table, last_id + 1)
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {STAGING_TABLE}')
+    catalog.invalidate()
+    return orders
+
+
+def top_pairs(product_id):
+    """The ``ProductPair`` rows behind ``product_id``'s recommendations, uncached."""
+    return (
+        ProductPair.objects.filter(product_id=product_id).select_related('other')
+        .order_by('-count', 'other_id')[:settings.RECOMMENDATIONS_PER_PRODUCT]
+    )
+
+
+def get_recommendations(product_id):
+    """Products most often bought with ``product_id``, best first."""
+    return catalog.get_or_load(
+        f'recommendations:{product_id}', lambda: [pair.other for pair in top_pairs(product_id)]
+    )
+
+
+async def aget_recommendations(product_id):
+    async def load():
+        return [pair.other async for pair in top_pairs(product_id)]
+
+    return await catalog.aget_or_load(f'recommendations:{product_id}', load)
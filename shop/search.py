@@ -0,0 +1,137 @@
+import re
+
+from django.core.exceptions import BadRequest
+from django.db import connection
+from django.db.models import Q
+
+from .models import Product
+from .pagination import KeysetPage, decode_cursor, encode_cursor, paginate_keyset
+
+FTS_TABLE = 'shop_product_fts'
+
+# Name matches weigh ten times more than description matches in BM25.
+RANK_FUNCTION = 'bm25(10.0, 1.0)'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def build_match_query(query):
+    """Turn free text into an FTS5 query where every word must match.
+
+    Words of two or more characters match as prefixes; single characters only
+    match whole tokens, since a one-letter prefix expands to most of the index.
+    """
+    tokens = TOKEN_RE.findall(query)
+    return ' '.join(f'"{token}"*' if len(token) > 1 else f'"{token}"' for token in tokens)
+
+
+def create_index(schema_editor):
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"name, description, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', %s)", [RANK_FUNCTION]
+    )
+
+
+def drop_index(schema_editor):
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def index_products(products):
+    if not fts_available():
+        return
+    rows = [(product.id, product.name, product.description) for product in products]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (%s, %s, %s)', rows
+        )
+
+
+def unindex_product(product_id):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product_id])
+
+
+def rebuild_index(batch_size=2000):
+    """Repopulate the index from ``shop_product``; returns the row count."""
+    if not fts_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    count = 0
+    batch = []
+    for product in Product.objects.only('id', 'name', 'description').iterator(chunk_size=batch_size):
+        batch.append(product)
+        if len(batch) >= batch_size:
+            index_products(batch)
+            count += len(batch)
+            batch = []
+    index_products(batch)
+    count += len(batch)
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return count
+
+
+def matching_ids(query):
+    match = build_match_query(query)
+    if not match:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_products(query, cursor=None, per_page=24):
+    """Return a page of products matching ``query``, best BM25 match first.
+
+    Pages are keyed on ``(rank, rowid)`` so following the cursor never
+    re-scores the rows already served. Databases without FTS5 fall back to a
+    substring match ordered by id.
+    """
+    if not fts_available():
+        products = Product.objects.filter(Q(name__icontains=query) | Q(description__icontains=query))
+        return paginate_keyset(products, cursor, per_page)
+
+    match = build_match_query(query)
+    if not match:
+        return KeysetPage()
+
+    sql = f'SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+    params = [match]
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 2:
+            raise BadRequest('Invalid page cursor.')
+        try:
+            rank, rowid = float(values[0]), int(values[1])
+        except (TypeError, ValueError):
+            raise BadRequest('Invalid page cursor.')
+        sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+        params += [rank, rank, rowid]
+    sql += ' ORDER BY rank, rowid LIMIT %s'
+    params.append(per_page + 1)
+
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        hits = db_cursor.fetchall()
+
+    next_cursor = ''
+    if len(hits) > per_page:
+        hits = hits[:per_page]
+        next_cursor = encode_cursor(list(hits[-1][::-1]))
+
+    products = Product.objects.in_bulk([product_id for product_id, rank in hits])
+    items = [products[product_id] for product_id, rank in hits if product_id in products]
+    return KeysetPage(items=items, next_cursor=next_cursor)
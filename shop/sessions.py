@@ -0,0 +1,14 @@
+"""Database sessions with load and save times recorded for profiling."""
+from django.contrib.sessions.backends import db
+
+from . import profiling
+
+
+class SessionStore(db.SessionStore):
+    def load(self):
+        with profiling.measure('session_load'):
+            return super().load()
+
+    def save(self, must_create=False):
+        with profiling.measure('session_save'):
+            return super().save(must_create)
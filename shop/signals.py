@@ -0,0 +1,59 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import catalog, facets, images, profiling, search
+from .cart import merge_guest_cart
+from .models import Product
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_values(sender, instance, raw=False, **kwargs):
+    instance.price_bucket = facets.bucket_for(instance.price)
+    if instance.pk and not raw:
+        instance._previous_image, instance._previous_price = (
+            Product.objects.filter(pk=instance.pk).values_list('image', 'price').first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Product)
+def index_saved_product(sender, instance, created=False, raw=False, **kwargs):
+    if created:
+        facets.adjust(instance.price, 1)
+    elif getattr(instance, '_previous_price', None) is not None:
+        facets.move(instance._previous_price, instance.price)
+    if not raw:
+        search.index_products([instance])
+        if instance.image:
+            name = instance.image.name
+            transaction.on_commit(lambda: images.generate_derivatives(name))
+        previous = getattr(instance, '_previous_image', None)
+        if previous and previous != instance.image.name:
+            transaction.on_commit(lambda: images.release_image(previous))
+    catalog.invalidate()
+
+
+@receiver(post_delete, sender=Product)
+def unindex_deleted_product(sender, instance, **kwargs):
+    search.unindex_product(instance.pk)
+    facets.adjust(instance.price, -1)
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: images.release_image(name))
+    catalog.invalidate()
+
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    if request is not None:
+        merge_guest_cart(request, user)
+
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    # Installed once per connection, so queries are timed in whichever
+    # thread runs them; the timer does nothing outside a profiled request.
+    if profiling.query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(profiling.query_timer)
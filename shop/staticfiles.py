@@ -0,0 +1,145 @@
+"""Hashed, precompressed static files, and the views that serve them and media.
+
+``collectstatic`` stores every file under a content-hashed name (the
+``ManifestStaticFilesStorage`` behaviour) and writes ``.gz`` and, when the
+optional ``brotli`` package is installed, ``.br`` siblings of the text
+assets. ``serve`` picks the best variant the client accepts and marks hashed
+names as cacheable forever: a changed file gets a new name, so browsers
+never need to revalidate. ``serve_media`` does the same for content-addressed
+product images and their derivatives, whose names are their content hash.
+"""
+import gzip
+import mimetypes
+import posixpath
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Names written by shop.storage (<sha256>.<ext>) and shop.images (<sha256>-<width>w.<ext>).
+CONTENT_ADDRESSED = re.compile(r'^([0-9a-f]{64}(?:-\d+w)?)\.\w+$')
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.json', '.map', '.svg', '.txt', '.xml', '.html', '.ico', '.ttf', '.eot')
+
+
+def encoders():
+    """``(content coding, file suffix, compress)`` in order of preference."""
+    if brotli is not None:
+        yield 'br', '.br', lambda data: brotli.compress(data, quality=11)
+    yield 'gzip', '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    min_compress_size = 256
+
+    def stored_name(self, name):
+        # Until collectstatic has written a manifest (a fresh checkout, the
+        # test runner) files are referenced by their plain names.
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as fh:
+            data = fh.read()
+        if len(data) < self.min_compress_size:
+            return
+        for _, suffix, compress in encoders():
+            compressed = compress(data)
+            # Keep a variant only if it saves something worth a second file.
+            if len(compressed) >= len(data) * 0.95:
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
+
+
+def find(path, document_root):
+    try:
+        fullpath = Path(safe_join(document_root, path))
+    except SuspiciousFileOperation:
+        raise Http404
+    if fullpath.is_file():
+        return fullpath
+    if settings.DEBUG and document_root == settings.STATIC_ROOT:
+        found = finders.find(path)
+        if found:
+            return Path(found)
+    raise Http404
+
+
+def file_response(request, fullpath, max_age, immutable=False, etag=None):
+    """Stream ``fullpath``, or a precompressed sibling the client accepts."""
+    content_type, _ = mimetypes.guess_type(fullpath.name)
+    accepted = {
+        coding.split(';')[0].strip()
+        for coding in request.headers.get('Accept-Encoding', '').split(',')
+    }
+    served, content_encoding, has_variants = fullpath, None, False
+    for coding, suffix, _ in encoders():
+        candidate = fullpath.with_name(fullpath.name + suffix)
+        if candidate.is_file():
+            has_variants = True
+            if content_encoding is None and coding in accepted:
+                served, content_encoding = candidate, coding
+
+    stat = served.stat()
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        response = FileResponse(
+            served.open('rb'), filename=fullpath.name, content_type=content_type or 'application/octet-stream',
+        )
+        if content_encoding:
+            response.headers['Content-Encoding'] = content_encoding
+    response.headers['Last-Modified'] = http_date(stat.st_mtime)
+    if etag:
+        response.headers['ETag'] = etag
+    if has_variants:
+        patch_vary_headers(response, ['Accept-Encoding'])
+    if immutable:
+        patch_cache_control(response, public=True, max_age=max_age, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=max_age)
+    return response
+
+
+def serve(request, path):
+    """Serve a collected static file; hashed names are cached for good."""
+    path = posixpath.normpath(path).lstrip('/')
+    fullpath = find(path, settings.STATIC_ROOT)
+    if path in set(getattr(staticfiles_storage, 'hashed_files', {}).values()):
+        return file_response(request, fullpath, settings.STATIC_IMMUTABLE_MAX_AGE, immutable=True)
+    return file_response(request, fullpath, settings.STATIC_MAX_AGE)
+
+
+def serve_media(request, path):
+    """Serve an uploaded file; content-addressed images carry their hash as ETag."""
+    path = posixpath.normpath(path).lstrip('/')
+    fullpath = find(path, settings.MEDIA_ROOT)
+    match = CONTENT_ADDRESSED.match(fullpath.name)
+    if match:
+        return file_response(
+            request, fullpath, settings.STATIC_IMMUTABLE_MAX_AGE, immutable=True, etag=f'"{match.group(1)}"',
+        )
+    return file_response(request, fullpath, settings.STATIC_MAX_AGE)
@@ -0,0 +1,71 @@
+"""Content-addressed storage for product images.
+
+Files are stored as ``<upload_to>/<h[:2]>/<sha256>.<ext>``, so uploading the
+same image twice keeps a single copy. A file is shared by every product that
+references it and is deleted once the last of them lets go (see
+``shop.images.release_image``); ``manage.py media_gc`` sweeps up anything
+left behind. Saving bytes that are already stored touches the file instead.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        digest = digest.hexdigest()
+        dirname = posixpath.dirname(name)
+        ext = posixpath.splitext(name)[1].lower()
+        return posixpath.join(dirname, digest[:2], digest + ext)
+
+    def get_available_name(self, name, max_length=None):
+        # Names are content hashes: an existing file with the same name holds
+        # the same bytes and is reused instead of renamed.
+        return name
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        full_path = self.path(name)
+        try:
+            # Reusing the file: a fresh mtime keeps release_image and media_gc
+            # from deleting it before the upload's product is saved.
+            os.utime(full_path)
+            return name
+        except FileNotFoundError:
+            pass
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file and rename it into place so concurrent
+        # uploads of the same image never observe a partial file.
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                for chunk in content.chunks():
+                    fh.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp_path, self.file_permissions_mode)
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return name
+
+
+product_image_storage = ContentAddressedStorage()
+
+
+def get_product_image_storage():
+    return product_image_storage
@@ -0,0 +1,42 @@
+"""Streaming responses that stay streamed under both WSGI and ASGI.
+
+Django 4.2 collects a sync iterator into a list before sending it under ASGI,
+and an async one before sending it under WSGI. ``StreamingResponse`` takes
+both and lets each handler iterate the one it can stream.
+"""
+from django.http import StreamingHttpResponse
+
+
+class StreamingResponse(StreamingHttpResponse):
+    """``chunks`` is served under WSGI and ``achunks``, an async iterable, under ASGI."""
+
+    def __init__(self, chunks, achunks, *args, **kwargs):
+        super().__init__(chunks, *args, **kwargs)
+        self.achunks = achunks
+
+    async def __aiter__(self):
+        async for part in self.achunks:
+            yield self.make_bytes(part)
+
+
+def chunked(lines, size):
+    """Join ``lines`` into strings of ``size`` lines each."""
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+async def achunked(lines, size):
+    buffer = []
+    async for line in lines:
+        buffer.append(line)
+        if len(buffer) >= size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
@@ -0,0 +1,32 @@
+from django import template
+from django.conf import settings
+
+from shop import images
+
+register = template.Library()
+
+
+@register.inclusion_tag('shop/includes/product_image.html')
+def product_image(product, css_class='', style='', sizes='100vw', width=None, lazy=True):
+    """Responsive ``<picture>`` for a product, falling back to the original upload."""
+    name = product.image.name if product.image else ''
+    context = {
+        'product': product,
+        'css_class': css_class,
+        'style': style,
+        'sizes': sizes,
+        'lazy': lazy,
+        'src': '',
+    }
+    if not name:
+        return context
+    if images.has_derivatives(name):
+        width = width or settings.PRODUCT_IMAGE_WIDTHS[0]
+        context.update({
+            'src': product.image.storage.url(images.derivative_name(name, width, 'jpg')),
+            'webp_srcset': images.srcset(name, 'webp'),
+            'jpg_srcset': images.srcset(name, 'jpg'),
+        })
+    else:
+        context['src'] = product.image.url
+    return context
@@ -1,5 +1,6 @@
 from django.urls import path
-from .views import product_list, cart_view, add_to_cart, remove_from_cart, checkout, thank_you, wishlist_view, add_to_wishlist, remove_from_wishlist, clear_cart, product_detail
+from . import api
+from .views import product_list, cart_view, add_to_cart, remove_from_cart, checkout, thank_you, wishlist_view, add_to_wishlist, remove_from_wishlist, clear_cart, product_detail, catalog_cache_stats, catalog_products, session_fragment
 
 urlpatterns = [
     path('', product_list, name='product_list'),
@@ -13,4 +14,9 @@ urlpatterns = [
     path('remove-from-wishlist/<int:product_id>/', remove_from_wishlist, name='remove_from_wishlist'),
     path('clear-cart/', clear_cart, name='clear_cart'),
     path('product/<int:product_id>/', product_detail, name='product_detail'),
+    path('session/fragment/', session_fragment, name='session_fragment'),
+    path('catalog/products/', catalog_products, name='catalog_products'),
+    path('catalog/cache-stats/', catalog_cache_stats, name='catalog_cache_stats'),
+    path('api/products/', api.products, name='api_products'),
+    path('api/products/export.ndjson', api.export_products, name='api_products_export'),
 ] 
\ No newline at end of file
@@ -1,93 +1,118 @@
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse
 from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from .models import Product, Order, Wishlist
+from django.contrib.admin.views.decorators import staff_member_required
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.views.decorators.cache import never_cache
+from . import catalog, facets, recommendations, wishlists
+from .models import Order, OrderItem
+from .cart import get_cart_store, get_priced_cart
+from .auth import aget_user
+from .conditional import acatalog_validators, aproduct_validators, conditional_page
+from .context_processors import ashop, cart_count
+from .db import retry_on_locked
+from .page_cache import cache_anonymous_page
 
 
 
-def product_list(request):
+@conditional_page(acatalog_validators)
+@cache_anonymous_page
+async def product_list(request):
+    user = await aget_user(request)
     query = request.GET.get('q', '')
-    products = Product.objects.all()
-    if query:
-        products = products.filter(name__icontains=query)
-    # Get user's wishlist items for highlighting
-    wishlist_items = []
-    if request.user.is_authenticated:
-        wishlist, created = Wishlist.objects.get_or_create(user=request.user)
-        wishlist_items = wishlist.products.all()
-    
-    return render(request, 'shop/product_list.html', {
-        'products': products,
-        'wishlist_items': wishlist_items,
-        'query': query
+    cursor = request.GET.get('after')
+    sort = request.GET.get('sort', '')
+    price = request.GET.get('price', '')
+    ordering = facets.ordering(sort)
+    page = await catalog.aget_product_page(
+        query, cursor, settings.SHOP_PRODUCTS_PER_PAGE, ordering,
+        facets.price_filters(facets.price_range(price), ordering),
+    )
+
+    next_query = ''
+    if page.has_next:
+        params = request.GET.copy()
+        params.pop('fragment', None)
+        params['after'] = page.next_cursor
+        next_query = params.urlencode()
+
+    context = {
+        'products': page.items,
+        'next_query': next_query,
+        'wishlist_ids': await wishlists.awishlist_product_ids(user),
+        'query': query,
+        'sort': sort,
+        'sorts': [(value, label) for value, (_, label) in facets.SORTS.items()],
+        'price': price,
+        'price_facets': [] if query else await facets.aprice_facets(),
+        **await ashop(request)
+    }
+    if request.GET.get('fragment'):
+        response = render(request, 'shop/includes/product_cards.html', context)
+        response['X-Next-Page'] = next_query
+        return response
+    return render(request, 'shop/product_list.html', context)
+
+async def catalog_products(request):
+    ordering = facets.ordering(request.GET.get('sort', ''))
+    page = await catalog.aget_product_page(
+        request.GET.get('q', ''), request.GET.get('after'), settings.SHOP_PRODUCTS_PER_PAGE, ordering,
+        facets.price_filters(facets.price_range(request.GET.get('price', '')), ordering),
+    )
+    return JsonResponse({
+        'products': [
+            {
+                'id': product.id,
+                'name': product.name,
+                'price': str(product.price),
+                'url': reverse('product_detail', args=[product.id]),
+            }
+            for product in page.items
+        ],
+        'next': page.next_cursor,
     })
 
 def cart_view(request):
-    cart = request.session.get('cart', {})
-    products = []
-    total = 0
-    
-    for product_id, quantity in cart.items():
-        try:
-            product = Product.objects.get(id=product_id)
-            products.append({
-                'product': product,
-                'quantity': quantity,
-                'subtotal': product.price * quantity
-            })
-            total += product.price * quantity
-        except Product.DoesNotExist:
-            pass
-    
+    cart = get_priced_cart(request)
     return render(request, 'shop/cart.html', {
-        'cart_items': products,
-        'total': total
+        'cart_items': cart.lines,
+        'total': cart.total
     })
 
 def add_to_cart(request, product_id):
     if request.method == 'POST':
-        product = get_object_or_404(Product, id=product_id)
-        cart = request.session.get('cart', {})
-        
-        if str(product_id) in cart:
-            cart[str(product_id)] += 1
-        else:
-            cart[str(product_id)] = 1
-        
-        request.session['cart'] = cart
+        product = catalog.get_product_or_404(product_id)
+        get_cart_store(request).add(product.id)
         messages.success(request, f'{product.name} added to cart!')
         
     return redirect('product_list')
 
 def remove_from_cart(request, product_id):
-    cart = request.session.get('cart', {})
-    if str(product_id) in cart:
-        del cart[str(product_id)]
-        request.session['cart'] = cart
+    if get_cart_store(request).remove(product_id):
         messages.success(request, 'Item removed from cart!')
     
     return redirect('cart_view')
 
 def clear_cart(request):
-    request.session['cart'] = {}
+    get_cart_store(request).clear()
     messages.success(request, 'Cart has been cleared!')
     return redirect('cart_view')
 
 @login_required
 def wishlist_view(request):
-    wishlist, created = Wishlist.objects.get_or_create(user=request.user)
-    return render(request, 'shop/wishlist.html', {'wishlist': wishlist})
+    products = wishlists.wishlist_products(request.user)
+    return render(request, 'shop/wishlist.html', {'products': products})
 
 @login_required
 def add_to_wishlist(request, product_id):
     if request.method == 'POST':
-        product = get_object_or_404(Product, id=product_id)
-        wishlist, created = Wishlist.objects.get_or_create(user=request.user)
-        
-        if product not in wishlist.products.all():
-            wishlist.products.add(product)
+        product = catalog.get_product_or_404(product_id)
+        if wishlists.add_to_wishlist(request.user, product):
             messages.success(request, f'{product.name} added to wishlist!')
         else:
             messages.info(request, f'{product.name} is already in your wishlist!')
@@ -96,72 +121,90 @@ def add_to_wishlist(request, product_id):
 
 @login_required
 def remove_from_wishlist(request, product_id):
-    product = get_object_or_404(Product, id=product_id)
-    wishlist, created = Wishlist.objects.get_or_create(user=request.user)
-    
-    if product in wishlist.products.all():
-        wishlist.products.remove(product)
+    product = catalog.get_product_or_404(product_id)
+    if wishlists.remove_from_wishlist(request.user, product):
         messages.success(request, f'{product.name} removed from wishlist!')
     
     return redirect('wishlist_view')
 
+@retry_on_locked
+def place_order(request, priced, name, email, address):
+    items = [
+        OrderItem(
+            product=line.product,
+            product_name=line.product.name,
+            unit_price=line.product.price,
+            quantity=line.quantity
+        )
+        for line in priced.lines
+    ]
+    order = Order(
+        user=request.user if request.user.is_authenticated else None,
+        name=name,
+        email=email,
+        address=address,
+        total_price=priced.total
+    )
+    order.summarize(items)
+    with transaction.atomic():
+        order.save()
+        for item in items:
+            item.order = order
+        OrderItem.objects.bulk_create(items)
+        facets.record_sales(items)
+        recommendations.record_order(items)
+        # Both stores clear the cart in this transaction, so a retried
+        # attempt cannot place the order twice.
+        get_cart_store(request).clear()
+    return order
+
 def checkout(request):
-    cart = request.session.get('cart', {})
-    if not cart:
+    priced = get_priced_cart(request)
+    if not priced:
         messages.warning(request, 'Your cart is empty!')
         return redirect('product_list')
     
-    products = []
-    total = 0
-    
-    for product_id, quantity in cart.items():
-        try:
-            product = Product.objects.get(id=product_id)
-            products.append({
-                'product': product,
-                'quantity': quantity,
-                'subtotal': product.price * quantity
-            })
-            total += product.price * quantity
-        except Product.DoesNotExist:
-            pass
-    
     if request.method == 'POST':
         name = request.POST.get('name')
         email = request.POST.get('email')
         address = request.POST.get('address')
         
         if name and email and address:
-            # Create order
-            order = Order.objects.create(
-                user=request.user if request.user.is_authenticated else None,
-                name=name,
-                email=email,
-                address=address,
-                cart_data=cart,
-                total_price=total
-            )
-            
-            # Clear cart
-            request.session['cart'] = {}
+            order = place_order(request, priced, name, email, address)
             messages.success(request, 'Order placed successfully!')
             return redirect('thank_you', order_id=order.id)
         else:
             messages.error(request, 'Please fill in all fields.')
     
     return render(request, 'shop/checkout.html', {
-        'cart_items': products,
-        'total': total
+        'cart_items': priced.lines,
+        'total': priced.total
     })
 
 def thank_you(request, order_id):
     order = get_object_or_404(Order, id=order_id)
     return render(request, 'shop/thank_you.html', {'order': order})
 
-def product_detail(request, product_id):
-    product = get_object_or_404(Product, id=product_id)
-    previous_url = request.META.get('HTTP_REFERER', '/')
+@conditional_page(aproduct_validators)
+@cache_anonymous_page
+async def product_detail(request, product_id):
+    user = await aget_user(request)
+    product = await catalog.aget_product_or_404(product_id)
     return render(request, 'shop/product_detail.html', {
         'product': product,
-        'previous_url': previous_url
+        'recommendations': await recommendations.aget_recommendations(product.id),
+        'wishlist_ids': await wishlists.awishlist_product_ids(user),
+        **await ashop(request)
+    })
+
+@never_cache
+def session_fragment(request):
+    return JsonResponse({
+        'csrf_token': get_token(request),
+        'cart_count': cart_count(request),
+        'messages': render_to_string('includes/messages.html', request=request),
     })
+
+@staff_member_required
+def catalog_cache_stats(request):
+    return JsonResponse(catalog.stats())
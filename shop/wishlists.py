@@ -0,0 +1,50 @@
+"""Read-mostly access to a user's wishlist.
+
+Page views only read through the wishlist/product join table and never create
+a ``Wishlist`` row; the row is created the first time a product is added.
+"""
+from .db import retry_on_locked
+from .models import Product, Wishlist
+
+WishlistItem = Wishlist.products.through
+
+
+def wishlist_product_ids(user):
+    """Product ids on the user's wishlist, for O(1) membership checks."""
+    if not user.is_authenticated:
+        return frozenset()
+    return frozenset(
+        WishlistItem.objects.filter(wishlist__user=user).values_list('product_id', flat=True)
+    )
+
+
+async def awishlist_product_ids(user):
+    if not user.is_authenticated:
+        return frozenset()
+    return frozenset([
+        product_id async for product_id in
+        WishlistItem.objects.filter(wishlist__user=user).values_list('product_id', flat=True)
+    ])
+
+
+def wishlist_products(user):
+    return list(Product.objects.filter(wishlists__user=user).distinct().order_by('id'))
+
+
+@retry_on_locked
+def add_to_wishlist(user, product):
+    """Add ``product`` and return True, or False if it was already there."""
+    wishlist = Wishlist.objects.filter(user=user).first()
+    if wishlist is None:
+        wishlist = Wishlist.objects.create(user=user)
+    elif WishlistItem.objects.filter(wishlist=wishlist, product=product).exists():
+        return False
+    wishlist.products.add(product)
+    return True
+
+
+@retry_on_locked
+def remove_from_wishlist(user, product):
+    """Remove ``product`` and return True, or False if it was not there."""
+    deleted, _ = WishlistItem.objects.filter(wishlist__user=user, product=product).delete()
+    return bool(deleted)
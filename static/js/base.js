@@ -0,0 +1,88 @@
+function initMessages(root) {
+    // Auto-dismiss messages after specified time
+    const messages = root.querySelectorAll('.message-toast');
+    messages.forEach(function(message) {
+        const dismissTime = message.getAttribute('data-auto-dismiss');
+        if (dismissTime) {
+            setTimeout(function() {
+                // Add fade class for animation
+                message.classList.add('fade');
+
+                // Remove element after animation completes
+                setTimeout(function() {
+                    if (message.parentNode) {
+                        message.parentNode.removeChild(message);
+                        // Check if container is empty and hide it
+                        const container = message.closest('.floating-messages-container');
+                        if (container && container.querySelectorAll('.message-toast').length === 0) {
+                            container.style.display = 'none';
+                        }
+                    }
+                }, 3000);
+            }, parseInt(dismissTime));
+        }
+    });
+
+    // Add click to dismiss functionality
+    messages.forEach(function(message) {
+        message.addEventListener('click', function(e) {
+            // Don't dismiss if clicking the close button
+            if (e.target.classList.contains('btn-close')) {
+                return;
+            }
+
+            this.classList.add('fade');
+            setTimeout(() => {
+                if (this.parentNode) {
+                    this.parentNode.removeChild(this);
+                    // Check if container is empty and hide it
+                    const container = this.closest('.floating-messages-container');
+                    if (container && container.querySelectorAll('.message-toast').length === 0) {
+                        container.style.display = 'none';
+                    }
+                }
+            }, 3000);
+        });
+    });
+
+    // Pause progress bar on hover
+    messages.forEach(function(message) {
+        message.addEventListener('mouseenter', function() {
+            const progressBar = this.querySelector('.message-progress::after');
+            if (progressBar) {
+                progressBar.style.animationPlayState = 'paused';
+            }
+        });
+
+        message.addEventListener('mouseleave', function() {
+            const progressBar = this.querySelector('.message-progress::after');
+            if (progressBar) {
+                progressBar.style.animationPlayState = 'running';
+            }
+        });
+    });
+}
+
+// Pages served from the anonymous page cache carry no session data;
+// fetch the CSRF token, cart badge and messages for this visitor.
+function loadSessionFragment() {
+    const placeholder = document.getElementById('session-fragment');
+    if (!placeholder) {
+        return;
+    }
+    fetch(placeholder.dataset.src, {credentials: 'same-origin'})
+        .then(function(response) { return response.json(); })
+        .then(function(data) {
+            document.querySelectorAll('input[name="csrfmiddlewaretoken"]').forEach(function(input) {
+                input.value = data.csrf_token;
+            });
+            document.getElementById('cart-count').textContent = data.cart_count || '';
+            placeholder.innerHTML = data.messages;
+            initMessages(placeholder);
+        });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    initMessages(document);
+    loadSessionFragment();
+});
@@ -0,0 +1,42 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Infinite scroll: fetch the next page as a fragment when the
+    // "Load More" link scrolls into view; the link still works without JS.
+    const link = document.getElementById('load-more');
+    const grid = document.querySelector('.product-grid');
+    if (!link || !grid || !('IntersectionObserver' in window)) {
+        return;
+    }
+    let loading = false;
+    const observer = new IntersectionObserver(function(entries) {
+        if (!entries[0].isIntersecting || loading) {
+            return;
+        }
+        loading = true;
+        const url = new URL(link.href);
+        url.searchParams.set('fragment', '1');
+        fetch(url, {headers: {'X-Requested-With': 'XMLHttpRequest'}})
+            .then(function(response) {
+                const next = response.headers.get('X-Next-Page');
+                return response.text().then(function(html) {
+                    grid.insertAdjacentHTML('beforeend', html);
+                    const token = document.querySelector('input[name="csrfmiddlewaretoken"]');
+                    if (token) {
+                        grid.querySelectorAll('input[name="csrfmiddlewaretoken"]').forEach(function(input) {
+                            input.value = token.value;
+                        });
+                    }
+                    if (next) {
+                        link.href = '?' + next;
+                        loading = false;
+                    } else {
+                        observer.disconnect();
+                        link.parentNode.remove();
+                    }
+                });
+            })
+            .catch(function() {
+                loading = false;
+            });
+    }, {rootMargin: '400px'});
+    observer.observe(link);
+});